@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+from collections import deque
+from itertools import cycle
+
+# =========================
+# Headless benchmarks for gamelibs.py
+#   python benchmarks.py                      run everything, print a table
+#   python benchmarks.py --out bench.json     also write machine-readable results
+#   python benchmarks.py --save-baseline      store results as the baseline
+#   python benchmarks.py --baseline b.json    exit 1 if anything is slower than baseline
+# =========================
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import gamelibs as g
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+SIZES = {"1000x700": (1000, 700), "4k": (3840, 2160)}
+
+# ------------- Timing -------------
+def measure(fn, setup=None, repeat=7, number=None, budget=0.2):
+    """Seconds per call of fn(arg): median and best of `repeat` batches of `number` calls.
+    setup() (untimed) builds a fresh arg per batch; number is auto-sized to ~budget/repeat."""
+    arg = setup() if setup else None
+    if number is None:
+        number, t0 = 1, time.perf_counter()
+        fn(arg)
+        once = time.perf_counter() - t0
+        number = max(1, int(budget / repeat / max(once, 1e-7)))
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else arg
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        times.append((time.perf_counter() - t0) / number)
+    times.sort()
+    return {"median_s": times[len(times) // 2], "min_s": times[0], "number": number, "repeat": repeat}
+
+def use_screen(size):
+    g.display = g.screen = pygame.display.set_mode(size)
+    return g.screen
+
+# ------------- Cases -------------
+def long_snake(length, size=SIZES["4k"]):
+    # A snake laid along the board's Hamiltonian cycle, so stepping along the cycle never dies
+    game = g.SnakeGame(*size, seed=1)
+    cols, rows = game.grid_size()
+    x = y = 0
+    body = []
+    for _ in range(length):
+        body.append((x, y))
+        dx, dy = g.cycle_dir(x, y, cols, rows)
+        x, y = x + dx, y + dy
+    game.snake = deque(reversed(body))
+    game.dir = g.cycle_dir(*body[-2], cols, rows) if length > 1 else (1, 0)
+    game.index_cells()
+    game.spawn_food()
+    return game
+
+def snake_step(game):
+    game.turn(g.cycle_dir(*game.snake[0], *game.grid_size()))
+    game.step()
+    game.grow = 0  # hold the length steady
+
+def atari_world(n, size=SIZES["4k"]):
+    rng = np.random.default_rng(n)
+    sim = g.AtariSim(*size, seed=n)
+    w, h = size
+    sim.enemies.spawn(x=rng.uniform(40, w - 40, n), y=rng.uniform(-30, h, n),
+                      speed=rng.uniform(150, 240, n), r=rng.integers(12, 21, n), kind=rng.integers(0, 2, n))
+    sim.bullets.spawn(x=rng.uniform(0, w, n), y=rng.uniform(0, h, n), speed=900.0, r=4)
+    sim.player.lives = 10 ** 9
+    return sim
+
+def cases():
+    out = {}
+    for length in (10, 100, 1000, 10000):
+        out[f"snake.step/len={length}"] = lambda L=length: measure(snake_step, lambda: long_snake(L), number=500)
+
+    # One autopilot decision, uncapped: BFS mode on the default board, cycle mode at 4k
+    for label, length in (("1000x700", 300), ("4k", 3000)):
+        out[f"snake.pilot/{label}/len={length}"] = lambda label=label, L=length: measure(
+            g.SnakePilot(budget=None).choose, lambda: long_snake(L, SIZES[label]))
+
+    # One call steps every board; random actions, so boards keep dying and restarting
+    for n, obs in ((4096, None), (4096, "grid")):
+        def vec_step(n=n, obs=obs):
+            env = g.VecSnake(n, seed=1, obs=obs)
+            actions = cycle(np.random.default_rng(1).integers(0, 4, (64, n)))
+            return measure(lambda _: env.step(next(actions)))
+        out[f"vecsnake.step/n={n}/obs={obs}"] = vec_step
+
+    for n in (100, 1000, 5000, 20000):
+        out[f"atari.step/n={n}"] = lambda n=n: measure(lambda sim: sim.step(sim.dt), lambda: atari_world(n), number=1, repeat=9)
+        out[f"atari.find_hits/n={n}"] = lambda n=n: measure(lambda sim: sim.find_hits(), lambda: atari_world(n))
+
+    for count in (200, 2000, 20000):
+        out[f"starfield.update/n={count}"] = lambda c=count: measure(lambda sf: sf.update(1 / 60), lambda: g.Starfield(c, seed=1))
+        out[f"starfield.draw/n={count}"] = lambda c=count: measure(lambda sf: sf.draw(g.screen), lambda: (use_screen(SIZES["1000x700"]), g.Starfield(c, seed=1))[1])
+
+    def text_miss(_):
+        g.text_cache.clear()
+        g.draw_text(g.screen, "Score: 12345", g.font_med, g.UI, topleft=(16, 16))
+    out["draw_text/hit"] = lambda: measure(lambda _: g.draw_text(g.screen, "Score: 12345", g.font_med, g.UI, topleft=(16, 16)))
+    out["draw_text/miss"] = lambda: measure(text_miss)
+    out["draw_counter"] = lambda: measure(lambda _: g.draw_counter(g.screen, "Score: ", 12345, g.font_med, g.UI, (16, 16)))
+
+    for label, size in SIZES.items():
+        def menu(size=size):
+            use_screen(size)
+            star = g.Starfield(220, size, seed=1)
+            return measure(lambda _: g.draw_menu(star, 0.0))
+
+        def atari(size=size):
+            use_screen(size)
+            sim, star = atari_world(500, size), g.Starfield(200, size, seed=1)
+            return measure(lambda _: g.draw_atari(sim, star))
+
+        def snake(size=size):
+            use_screen(size)
+            game = long_snake(1000, size)
+            return measure(lambda _: game.draw())
+
+        def tictactoe(size=size, preset=(3, 3, 3)):
+            use_screen(size)
+            game = g.TicTacToe(*preset)
+            for i in range(0, game.rules.cells, 2):
+                game.bits["X" if i % 4 else "O"] |= 1 << i
+            return measure(lambda _: game.draw())
+
+        out[f"draw.menu/{label}"] = menu
+        out[f"draw.atari/{label}"] = atari
+        out[f"draw.snake/{label}"] = snake
+        out[f"draw.tictactoe/{label}"] = tictactoe
+        out[f"draw.tictactoe15/{label}"] = lambda size=size: tictactoe(size, (15, 15, 5))
+
+    def scaled_present():
+        # The software fallback of a 0.5 render scale: a 1080p buffer stretched to 4k
+        use_screen(SIZES["4k"])
+        g.render_target((1920, 1080))
+        return measure(lambda _: g.present(None))
+    out["present.scaled/4k@0.5"] = scaled_present
+    return out
+
+# ------------- Runner -------------
+def run(only=None):
+    g.init_display()
+    random.seed(0)
+    results = {}
+    for name, case in cases().items():
+        if only and not any(pat in name for pat in only):
+            continue
+        use_screen(SIZES["1000x700"])
+        results[name] = case()
+        print(f"{name:32s} {results[name]['median_s'] * 1e6:12.1f} us", flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(), "pygame": pygame.version.ver, "numpy": np.__version__,
+            "machine": platform.machine(), "platform": platform.platform(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def regressions(report, baseline, tolerance):
+    # A case regresses when its median is more than `tolerance` slower than the baseline's
+    slow = []
+    for name, base in baseline["results"].items():
+        cur = report["results"].get(name)
+        if cur and cur["median_s"] > base["median_s"] * (1 + tolerance):
+            slow.append((name, base["median_s"], cur["median_s"]))
+    return slow
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless benchmarks for gamelibs.py")
+    ap.add_argument("--out", metavar="PATH", help="write results as JSON")
+    ap.add_argument("--baseline", metavar="PATH", default=BASELINE, help="baseline to compare against (default: %(default)s)")
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the baseline instead of comparing")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (default: %(default)s = 25%%)")
+    ap.add_argument("--only", nargs="*", help="run cases whose name contains any of these")
+    args = ap.parse_args(argv)
+
+    report = run(args.only)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        slow = regressions(report, json.load(f), args.tolerance)
+    for name, was, now in slow:
+        print(f"REGRESSION {name}: {was * 1e6:.1f} us -> {now * 1e6:.1f} us ({now / was:.2f}x)")
+    return 1 if slow else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
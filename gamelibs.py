@@ -1,6 +1,17 @@
+import time
+STARTED = time.perf_counter()  # --startup measures time to first frame from here
+import gc
+import os
 import sys
+import json
+import atexit
 import random
+from collections import OrderedDict, deque
 import math
+import mmap
+import struct
+import zlib
+import numpy as np
 import pygame
 
 # =========================
@@ -8,20 +19,84 @@ import pygame
 # =========================
 
 # ------------- Init -------------
-pygame.init()
-pygame.display.set_caption("Arcade: Atari, Snake, Tic Tac Toe")
-
 # Window + fullscreen toggle
 DEFAULT_SIZE = (1000, 700)
+HUD_H = 60  # top HUD bar height, reserved by every game
+HUD_STATUS = (0, 0, 320, HUD_H - 2)  # left HUD area holding score/turn text
 screen_flags = pygame.HWSURFACE | pygame.DOUBLEBUF
-screen = pygame.display.set_mode(DEFAULT_SIZE, screen_flags)
-clock = pygame.time.Clock()
 
-# Fonts
-font_title = pygame.font.SysFont("arial", 64, bold=True)
-font_big = pygame.font.SysFont("arial", 40, bold=True)
-font_med = pygame.font.SysFont("arial", 28, bold=True)
-font_small = pygame.font.SysFont("consolas", 20)
+# Display, clock and fonts are created by init_display() so the simulation
+# classes below can be imported and stepped without opening a window.
+# Games draw to `screen`. In fullscreen with a render scale / logical size set it is
+# smaller than the display: SDL scales it up, or failing that present() does.
+screen = None
+display = None
+clock = None
+font_title = font_big = font_med = font_small = None
+render_scale = 1.0   # fraction of the fullscreen resolution the games render at
+logical_size = None  # fixed fullscreen (w, h) to render at instead; overrides render_scale
+
+def init_display():
+    global display, clock, font_title, font_big, font_med, font_small
+    if screen is not None:
+        return screen
+    # Only what the games use: pygame.init() would also start audio and joysticks
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_caption("Arcade: Atari, Snake, Tic Tac Toe")
+    display = pygame.display.set_mode(DEFAULT_SIZE, screen_flags)
+    render_target()
+    clock = pygame.time.Clock()
+
+    # Fonts, opened on first use
+    font_title = LazyFont("arial", 64, bold=True)
+    font_big = LazyFont("arial", 40, bold=True)
+    font_med = LazyFont("arial", 28, bold=True)
+    font_small = LazyFont("consolas", 20)
+    return screen
+
+FONT_CACHE_FILE = "fonts.json"
+_font_files = None  # "name|bold" -> [path or None, synthetic bold], mirrored in the cache dir
+
+def sys_font(name, size, bold=False):
+    """pygame.font.SysFont without the system font scan on every launch: the file it
+    resolves to is remembered in the arcade cache (delete fonts.json to re-scan)."""
+    global _font_files
+    path = cache_path(FONT_CACHE_FILE)
+    if _font_files is None:
+        try:
+            with open(path) as f:
+                _font_files = json.load(f)
+        except (OSError, ValueError):
+            _font_files = {}
+    key = f"{name}|{int(bold)}"
+    hit = _font_files.get(key)
+    if not hit or (hit[0] is not None and not os.path.exists(hit[0])):
+        found = []
+        pygame.font.SysFont(name, size, bold, constructor=lambda file, px, set_bold, set_italic: found.append([file, set_bold]))
+        hit = _font_files[key] = found[0]
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(_font_files, f)
+        except OSError:
+            pass  # read-only home: scan again next launch
+    font = pygame.font.Font(hit[0], size)
+    if hit[1]:
+        font.set_bold(True)  # as SysFont does when there is no bold face
+    return font
+
+class LazyFont:
+    """Stands in for a pygame Font and opens it (sys_font) the first time it is used."""
+    def __init__(self, name, size, bold=False):
+        self.spec = (name, size, bold)
+        self.font = None
+
+    def __getattr__(self, attr):
+        # Only reached for Font attributes: open the font, then forward
+        if self.font is None:
+            self.font = sys_font(*self.spec)
+        return getattr(self.font, attr)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -37,8 +112,35 @@ BLUE = (80, 140, 255)
 YELLOW = (240, 200, 80)
 
 # ------------- Helpers -------------
-def draw_text(surface, text, font, color, center=None, topleft=None):
-    img = font.render(text, True, color)
+class TextCache:
+    """Bounded LRU of rendered text surfaces keyed by (text, font, color, antialias)."""
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font, color, antialias=True):
+        key = (text, font, color, antialias)
+        img = self.items.get(key)
+        if img is not None:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return img
+        self.misses += 1
+        img = font.render(text, antialias, color)
+        self.items[key] = img
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+        return img
+
+    def clear(self):
+        self.items.clear()
+
+text_cache = TextCache()
+
+def draw_text(surface, text, font, color, center=None, topleft=None, antialias=True):
+    img = text_cache.render(text, font, color, antialias)
     rect = img.get_rect()
     if center is not None:
         rect.center = center
@@ -47,46 +149,703 @@ def draw_text(surface, text, font, color, center=None, topleft=None):
     surface.blit(img, rect)
     return rect
 
+def draw_counter(surface, label, value, font, color, topleft, antialias=True):
+    # "Label: 1234" from a cached label plus cached single-digit glyphs, so a
+    # changing number never renders (or caches) a new surface
+    x, y = topleft
+    rect = draw_text(surface, label, font, color, topleft=(x, y), antialias=antialias)
+    x = rect.right
+    for ch in str(value):
+        glyph = draw_text(surface, ch, font, color, topleft=(x, y), antialias=antialias)
+        x = glyph.right
+        rect.union_ip(glyph)
+    return rect
+
+def cache_path(name):
+    # Per-user cache for generated data (solved tables, ...); ARCADE_CACHE overrides
+    root = os.environ.get("ARCADE_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "arcade")
+    return os.path.join(root, name)
+
 def clamp(v, lo, hi):
     return max(lo, min(hi, v))
 
 def toggle_fullscreen():
-    global screen, screen_flags
-    if screen.get_flags() & pygame.FULLSCREEN:
+    global display, screen_flags
+    if display.get_flags() & pygame.FULLSCREEN:
         screen_flags = pygame.HWSURFACE | pygame.DOUBLEBUF
-        screen = pygame.display.set_mode(DEFAULT_SIZE, screen_flags)
-    else:
-        info = pygame.display.Info()
-        screen_flags = pygame.FULLSCREEN | pygame.HWSURFACE | pygame.DOUBLEBUF
-        screen = pygame.display.set_mode((info.current_w, info.current_h), screen_flags)
+        display = pygame.display.set_mode(DEFAULT_SIZE, screen_flags)
+        render_target()
+        return
+    # The monitor's resolution; Info().current_w/h is the window's once set_mode has run
+    full = pygame.display.get_desktop_sizes()[0]
+    size = logical_size or (max(1, round(full[0] * render_scale)), max(1, round(full[1] * render_scale)))
+    screen_flags = pygame.FULLSCREEN | pygame.HWSURFACE | pygame.DOUBLEBUF
+    try:
+        # Below native resolution let SDL scale on the GPU, so a 4k display runs
+        # (and uploads) a 1080p frame; else render_target() scales in software
+        display = pygame.display.set_mode(size, screen_flags | (pygame.SCALED if size != full else 0))
+    except pygame.error:
+        display = pygame.display.set_mode(full, screen_flags)
+    render_target(size)
+
+def render_target(size=None):
+    # `screen` for the current window: the window itself, or a buffer at the
+    # logical size when the window could not be given that size directly
+    global screen
+    size = tuple(size or display.get_size())
+    screen = display if display.get_size() == size else pygame.Surface(size).convert()
+    return screen
+
+def present(rects=None):
+    # Show the frame: rects = the parts of `screen` that changed, None = all of it.
+    # A scaled buffer is stretched (nearest pixel) only where it changed.
+    recorder.grab(screen, rects != [])
+    if screen is display:
+        if rects is None:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        return
+    if rects is None:
+        pygame.transform.scale(screen, display.get_size(), display)
+        pygame.display.flip()
+        return
+    sx, sy = display.get_width() / screen.get_width(), display.get_height() / screen.get_height()
+    bounds, out = screen.get_rect(), []
+    for r in rects:
+        r = bounds.clip(r)
+        if r.w and r.h:
+            x, y = int(r.x * sx), int(r.y * sy)
+            dest = pygame.Rect(x, y, math.ceil(r.right * sx) - x, math.ceil(r.bottom * sy) - y)
+            pygame.transform.scale(screen.subsurface(r), dest.size, display.subsurface(dest))
+            out.append(dest)
+    if out:
+        pygame.display.update(out)
+
+def to_logical(pos):
+    # Window pixel -> `screen` pixel (mouse events)
+    if screen is display:
+        return pos
+    return (pos[0] * screen.get_width() // display.get_width(), pos[1] * screen.get_height() // display.get_height())
+
+_shades = {}
+
+def shade(surface, color, alpha):
+    # Darken all of surface with a flat translucent color: a cached opaque layer with
+    # surface alpha blends much faster than a fresh full-screen SRCALPHA one
+    key = (surface.get_size(), color, alpha)
+    layer = _shades.get(key)
+    if layer is None:
+        _shades.clear()
+        layer = _shades[key] = pygame.Surface(surface.get_size()).convert()
+        layer.fill(color)
+        layer.set_alpha(alpha)
+    surface.blit(layer, (0, 0))
+
+class LayerCache:
+    """A pre-rendered static surface, rebuilt only when the size it was rendered for changes
+    (window resize or toggle_fullscreen)."""
+    def __init__(self, render):
+        self.render = render
+        self.size = None
+        self.surf = None
+
+    def get(self, size):
+        if size != self.size:
+            self.surf = self.render(size)
+            self.size = size
+        return self.surf
+
+    def invalidate(self):
+        self.size = None
+
+class FixedStep:
+    """Fixed-timestep scheduler. Frame time goes into an accumulator that is drained in
+    whole `dt` steps, at most `max_steps` per frame (any older backlog is dropped rather
+    than spiralling); `alpha` is the leftover fraction of a step for render interpolation."""
+    def __init__(self, dt, max_steps=5):
+        self.dt = dt
+        self.max_steps = max_steps
+        self.acc = 0.0
+        self.ticks = 0
+
+    def advance(self, frame_dt):
+        """Add one frame's real time and return how many fixed steps to run now."""
+        self.acc += frame_dt
+        n = int(self.acc / self.dt)
+        if n > self.max_steps:
+            n = self.max_steps
+            self.acc = n * self.dt + self.acc % self.dt
+        self.acc -= n * self.dt
+        self.ticks += n
+        return n
+
+    @property
+    def alpha(self):
+        return self.acc / self.dt
+
+    def reset(self):
+        self.acc = 0.0
+
+def run_turbo(step, dt, max_ticks, done=None):
+    """Turbo mode: call step(dt) back to back with no frame cap and no drawing until
+    done() is true or max_ticks is reached. Returns (ticks run, wall seconds)."""
+    t0 = time.perf_counter()
+    ticks = 0
+    while ticks < max_ticks and not (done and done()):
+        step(dt)
+        ticks += 1
+    return ticks, time.perf_counter() - t0
+
+def restore(surface, layer, rect):
+    # Repaint one patch of a cached layer and hand back the rect for display.update
+    rect = pygame.Rect(rect).clip(surface.get_rect())
+    surface.blit(layer, rect, rect)
+    return rect
+
+class FrameProfiler:
+    """Per-phase frame timing for the game loops. A loop calls begin_frame() after its
+    clock tick, lap(phase) as each phase ends and end_frame() after presenting; all of
+    it is a no-op unless the F3 overlay or a --profile export is on."""
+    PHASES = ("events", "input", "update", "collision", "draw", "flip")
+    window = 240  # frames kept for the graph and percentiles
+
+    def __init__(self):
+        self.enabled = False
+        self.overlay = False
+        self.out = None
+        self.frames = deque(maxlen=self.window)  # (interval ms, work ms)
+        self.avg = dict.fromkeys(self.PHASES, 0.0)
+        self.counts = {}
+        self.spans = []
+        self.frame_no = 0
+        self.t_start = time.perf_counter()
+        self.panel = None
+        self.panel_at = 0.0
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+
+    def export(self, path):
+        """Stream one record per frame to path: .json = Chrome trace, anything else = CSV."""
+        self.out = open(path, "w", buffering=1 << 16)
+        self.trace = path.endswith(".json")
+        if self.trace:
+            self.out.write("[\n")
+        else:
+            self.out.write("frame,time_s,interval_ms,work_ms," + ",".join(f"{p}_ms" for p in self.PHASES) + ",alloc_blocks,gc_runs,counts\n")
+        atexit.register(self.close)
+
+    def close(self):
+        if self.out is not None:
+            if self.trace:
+                self.out.write("{}]\n")
+            self.out.close()
+            self.out = None
+
+    def begin_frame(self, dt):
+        # F3 takes effect here, so a frame is always profiled whole or not at all
+        self.enabled = self.overlay or self.out is not None
+        if not self.enabled:
+            return
+        self.interval = dt * 1000.0
+        self.counts = {}
+        self.spans = []
+        self.blocks = sys.getallocatedblocks()
+        self.gc_runs = sum(s["collections"] for s in gc.get_stats())
+        self.t0 = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.spans.append((phase, self.last, now))
+        self.last = now
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = value
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        work = (time.perf_counter() - self.t0) * 1000.0
+        alloc = sys.getallocatedblocks() - self.blocks
+        gc_runs = sum(s["collections"] for s in gc.get_stats()) - self.gc_runs
+        phase_ms = dict.fromkeys(self.PHASES, 0.0)
+        for phase, a, b in self.spans:
+            phase_ms[phase] = phase_ms.get(phase, 0.0) + (b - a) * 1000.0
+        for p in self.PHASES:
+            self.avg[p] += (phase_ms[p] - self.avg[p]) * 0.05
+        self.frames.append((self.interval, work))
+        self.alloc, self.gc_last = alloc, gc_runs
+        self.frame_no += 1
+        if self.out is not None:
+            self.write(phase_ms, work, alloc, gc_runs)
+
+    def write(self, phase_ms, work, alloc, gc_runs):
+        t0 = self.t_start
+        if not self.trace:
+            counts = ";".join(f"{k}={v}" for k, v in self.counts.items())
+            cols = ",".join(f"{phase_ms[p]:.3f}" for p in self.PHASES)
+            self.out.write(f"{self.frame_no},{self.t0 - t0:.4f},{self.interval:.3f},{work:.3f},{cols},{alloc},{gc_runs},{counts}\n")
+            return
+        us = lambda t: round((t - t0) * 1e6, 1)
+        ev = [{"name": "frame", "ph": "X", "pid": 1, "tid": 1, "ts": us(self.t0), "dur": round(work * 1000, 1)}]
+        for phase, a, b in self.spans:
+            ev.append({"name": phase, "ph": "X", "pid": 1, "tid": 1, "ts": us(a), "dur": round((b - a) * 1e6, 1)})
+        args = dict(self.counts, alloc_blocks=alloc, gc_runs=gc_runs)
+        ev.append({"name": "counts", "ph": "C", "pid": 1, "ts": us(self.t0), "args": args})
+        self.out.write("".join(json.dumps(e) + ",\n" for e in ev))
+
+    def draw(self, surface):
+        """Draw the F3 overlay (frame-time graph, percentiles, phases, counts); returns its rect."""
+        if not self.overlay or not self.frames:
+            return None
+        w = surface.get_width()
+        rect = pygame.Rect(w - 330, HUD_H + 10, 320, 210)
+        now = time.perf_counter()
+        if self.panel is None or now - self.panel_at > 0.25:
+            # Text is rebuilt 4x a second: readable, and it keeps churn out of text_cache
+            self.panel_at = now
+            self.panel = self.render_panel(rect.size)
+        surface.blit(self.panel, rect)
+        # Rolling frame-interval graph, 16.7 ms line = 60 FPS
+        gx, gy, gh = rect.x + 10, rect.bottom - 10, 60
+        pygame.draw.line(surface, (90, 90, 110), (gx, gy - gh // 2), (gx + self.window, gy - gh // 2))
+        pts = [(gx + i, gy - min(gh, int(ms * gh / 33.3))) for i, (ms, _) in enumerate(self.frames)]
+        if len(pts) > 1:
+            pygame.draw.lines(surface, GREEN, False, pts)
+        return rect
+
+    def render_panel(self, size):
+        panel = pygame.Surface(size, pygame.SRCALPHA)
+        panel.fill((10, 12, 18, 210))
+        iv = np.array([f[0] for f in self.frames])
+        wk = np.array([f[1] for f in self.frames])
+        p_iv = np.percentile(iv, (50, 95, 99))
+        p_wk = np.percentile(wk, (50, 95, 99))
+        lines = [
+            f"frame  p50 {p_iv[0]:5.1f}  p95 {p_iv[1]:5.1f}  p99 {p_iv[2]:5.1f} ms",
+            f"work   p50 {p_wk[0]:5.1f}  p95 {p_wk[1]:5.1f}  p99 {p_wk[2]:5.1f} ms",
+            "  ".join(f"{p[:4]} {self.avg[p]:.1f}" for p in self.PHASES[:3]),
+            "  ".join(f"{p[:4]} {self.avg[p]:.1f}" for p in self.PHASES[3:]),
+            "  ".join(f"{k} {v}" for k, v in self.counts.items()) + f"  alloc {self.alloc:+d}  gc {self.gc_last}",
+        ]
+        y = 8
+        for line in lines:
+            panel.blit(font_small.render(line, True, UI), (10, y))
+            y += 22
+        return panel
+
+profiler = FrameProfiler()
+
+def pixel_format(surface):
+    # ffmpeg's name for the byte order of a 32-bit surface's pixels, e.g. "bgr0"
+    names = dict(zip(surface.get_shifts()[:3], "rgb"))
+    if surface.get_masks()[3]:
+        names[surface.get_shifts()[3]] = "a"
+    order = (0, 8, 16, 24) if sys.byteorder == "little" else (24, 16, 8, 0)
+    return "".join(names.get(shift, "0") for shift in order)
+
+def gzip_frame(pixels):
+    # One self-contained gzip member; members concatenate into a valid .gz stream
+    z = zlib.compressobj(1, zlib.DEFLATED, 31)
+    return z.compress(pixels) + z.flush()
+
+class FrameRecorder:
+    """Background capture of presented frames. grab() is all the game loop pays: one
+    row-by-row copy of the screen, through a buffer view, into a free slot of a small
+    preallocated ring. When every slot is still queued the frame is dropped and counted
+    instead of waiting. A writer thread gzips frames for the in-memory clip of the last
+    clip_seconds (F9 saves it) and streams them to a .raw / .raw.gz file or an encoder's
+    stdin. With no file or encoder the clip is all there is, and the copy keeps every
+    k-th pixel of every k-th row so clip frames are at most clip_width wide. Output is constant-rate: a frame that stays up (still scenes present nothing)
+    is repeated, and a window size change starts a new segment. Files get a .json sidecar
+    with the size, ffmpeg pixel format and rate."""
+    slots = 6
+    fps = 30
+    clip_seconds = 30.0
+    clip_width = 1280  # 4k clip frames are 1280x720: about a sixth of a full-frame copy
+
+    def __init__(self):
+        self.thread = None
+        self.dropped = self.grabbed = 0
+        self.last_grab = -math.inf
+        self.stale = False  # a changed frame was skipped by the rate limit
+
+    def start(self, clip=True, path=None, command=None):
+        """clip: keep the last clip_seconds in memory. path: stream to .raw or .raw.gz;
+        command: pipe raw frames to a shell command, {w} {h} {fps} {pix_fmt} {n} filled in."""
+        import queue
+        import threading
+        self.clip_on, self.path, self.command = clip, path, command
+        self.free = deque([None] * self.slots)  # arrays, made at the frame size on first use
+        self.full = queue.Queue()
+        self.clip = deque()  # (time, gzip member) for the current frame size
+        self.thread = threading.Thread(target=self.write_loop, name="frame-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def grab(self, surface, changed=True):
+        if self.thread is None:
+            return
+        now = time.perf_counter()
+        if now - self.last_grab < 0.75 / self.fps or not (changed or self.stale):
+            self.stale = self.stale or changed
+            return
+        if surface.get_bytesize() != 4 or not self.free:
+            self.dropped += 1
+            profiler.count("rec_dropped", self.dropped)
+            return
+        self.last_grab, self.stale = now, False
+        slot = self.free.popleft()
+        w, h = surface.get_size()
+        k = 1 if self.path or self.command else -(-w // self.clip_width)
+        shape = (-(-h // k), -(-w // k))
+        if slot is None or slot.shape != shape:
+            slot = np.empty(shape, np.uint32)
+        view = surface.get_view("2")  # (w, h) over the pixel rows: .T is row order again
+        np.copyto(slot, np.asarray(view)[::k, ::k].T)
+        del view  # unlocks the surface
+        self.grabbed += 1
+        self.full.put(("frame", now, slot, pixel_format(surface)))
+
+    def save_clip(self, path=None):
+        """Write the last clip_seconds to path (default: the arcade cache's clips/)."""
+        if self.thread is None or not self.clip_on:
+            return None
+        path = path or cache_path(os.path.join("clips", time.strftime("clip-%Y%m%d-%H%M%S.raw.gz")))
+        self.full.put(("clip", time.perf_counter(), path))
+        return path
+
+    def close(self):
+        if self.thread is not None:
+            self.full.put(("stop", time.perf_counter()))
+            self.thread.join(5.0)
+            self.thread = None
+
+    # Writer thread
+    def write_loop(self):
+        self.format = None  # ((w, h), pix_fmt) of the current segment
+        self.segment = 0
+        self.out = self.encoder = None
+        self.held = None  # (time, slot, member) of the frame on screen now
+        while True:
+            kind, now, *args = self.full.get()
+            if kind == "frame":
+                slot, fmt = args
+                self.emit_held(now)
+                size = (slot.shape[1], slot.shape[0])
+                if (size, fmt) != self.format:
+                    self.format = (size, fmt)
+                    self.clip.clear()
+                    self.open_segment(now)
+                member = gzip_frame(slot) if self.clip_on or (self.path or "").endswith(".gz") else None
+                if self.clip_on:
+                    self.clip.append((now, member))
+                    while len(self.clip) > 1 and self.clip[1][0] <= now - self.clip_seconds:
+                        self.clip.popleft()
+                self.held = (now, slot, member)
+            elif kind == "clip":
+                self.write_clip(now, args[0])
+            else:
+                self.emit_held(now)
+                self.close_segment()
+                return
+
+    def repeats(self, start, end):
+        return max(1, round((end - start) * self.fps))
+
+    def emit_held(self, now):
+        # The held frame stayed up until now: write it until the output catches up
+        # with the segment's clock (at least once, so no grabbed frame is lost)
+        if self.held is None:
+            return
+        _, slot, member = self.held
+        data = member if self.out is not None and self.path.endswith(".gz") else slot
+        target = max(self.written + 1, round((now - self.t0) * self.fps))
+        try:
+            for _ in range(target - self.written):
+                if self.out is not None:
+                    self.out.write(data)
+                if self.encoder is not None:
+                    self.encoder.stdin.write(slot)
+            self.written = target
+        except OSError as e:
+            print(f"frame capture: output stopped ({e})", file=sys.stderr)
+            self.close_segment()
+            self.path = self.command = None
+        self.free.append(slot)
+        self.held = None
+
+    def sidecar(self, path, n_frames=None):
+        (w, h), fmt = self.format
+        cat = f"zcat {path} | " if path.endswith(".gz") else ""
+        info = {"w": w, "h": h, "fps": self.fps, "pix_fmt": fmt, "frames": n_frames,
+                "ffmpeg": f"{cat}ffmpeg -f rawvideo -pix_fmt {fmt} -s {w}x{h} -r {self.fps} -i {'-' if cat else path} out.mp4"}
+        with open(path + ".json", "w") as f:
+            json.dump(info, f, indent=2)
+
+    def open_segment(self, now):
+        import subprocess
+        self.close_segment()
+        self.t0, self.written = now, 0
+        (w, h), fmt = self.format
+        if self.path:
+            path = self.path
+            if self.segment:
+                head, tail = os.path.split(path)
+                stem, dot, ext = tail.partition(".")
+                path = os.path.join(head, f"{stem}-{self.segment}{dot}{ext}")
+            self.out = open(path, "wb")
+            self.sidecar(path)
+        if self.command:
+            cmd = self.command.format(w=w, h=h, fps=self.fps, pix_fmt=fmt, n=self.segment)
+            self.encoder = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE)
+        self.segment += 1
+
+    def close_segment(self):
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+        if self.encoder is not None:
+            try:
+                self.encoder.stdin.close()
+            except OSError:
+                pass
+            self.encoder.wait()
+            self.encoder = None
+
+    def write_clip(self, now, path):
+        if not self.clip:
+            return
+        start = now - self.clip_seconds
+        frames = list(self.clip) + [(now, None)]
+        n = 0
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                for (t, member), (t_next, _) in zip(frames, frames[1:]):
+                    if t_next > start:
+                        for _ in range(self.repeats(max(t, start), t_next)):
+                            f.write(member)
+                            n += 1
+            self.sidecar(path, n)
+        except OSError as e:
+            print(f"clip not saved: {e}", file=sys.stderr)
+            return
+        print(f"clip saved to {path}")
+
+recorder = FrameRecorder()
 
 # Simple starfield background for style
 class Starfield:
-    def __init__(self, count=180):
-        w, h = screen.get_width(), screen.get_height()
+    """Stars as NumPy arrays: one vectorized pass moves/wraps them all and draw()
+    writes them straight into the surface's pixels, so density is nearly free."""
+    color = (170, 185, 220)
+
+    def __init__(self, count=180, size=DEFAULT_SIZE, seed=None):
+        w, h = size
+        self.w, self.h = w, h
+        self.rng = np.random.default_rng(seed)
+        self.x = self.rng.uniform(0, w, count)
+        self.y = self.rng.uniform(0, h, count)
+        self.speed = self.rng.uniform(20, 120, count)
+        self.size = self.rng.integers(1, 3, count)
+
+    def resize(self, w, h):
         self.w, self.h = w, h
-        self.stars = []
-        for _ in range(count):
-            x = random.uniform(0, w)
-            y = random.uniform(0, h)
-            speed = random.uniform(20, 120)
-            size = random.randint(1, 2)
-            self.stars.append([x, y, speed, size])
 
     def update(self, dt, speed_scale=1.0):
-        w, h = screen.get_width(), screen.get_height()
-        # Adapt to new size if changed
-        if (self.w, self.h) != (w, h):
-            self.w, self.h = w, h
-        for s in self.stars:
-            s[1] += s[2] * dt * speed_scale
-            if s[1] > self.h + 5:
-                s[0] = random.uniform(0, self.w)
-                s[1] = -5
+        self.y += self.speed * (dt * speed_scale)
+        wrapped = np.flatnonzero(self.y > self.h + 5)
+        if wrapped.size:
+            self.x[wrapped] = self.rng.uniform(0, self.w, wrapped.size)
+            self.y[wrapped] = -5
 
     def draw(self, surf):
-        for x, y, _, size in self.stars:
-            pygame.draw.rect(surf, (170, 185, 220), (int(x), int(y), size, size))
+        # Adapt to new size if changed
+        if (self.w, self.h) != surf.get_size():
+            self.resize(*surf.get_size())
+        w, h = self.w, self.h
+        x = self.x.astype(np.int64)
+        y = self.y.astype(np.int64)
+        try:
+            pixels = pygame.surfarray.pixels2d(surf)
+        except ValueError:
+            # 24-bit and other surfaces surfarray can't reference: per-star rects
+            for sx, sy, size in zip(x.tolist(), y.tolist(), self.size.tolist()):
+                pygame.draw.rect(surf, self.color, (sx, sy, size, size))
+            return
+        col = surf.map_rgb(self.color)
+        big = self.size == 2
+        # Size-2 stars are the 1px star plus three neighbours
+        for ox, oy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            px, py = (x, y) if ox == oy == 0 else (x[big] + ox, y[big] + oy)
+            on = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+            pixels[px[on], py[on]] = col
+        del pixels  # release the surface lock
+
+# ------------- Scenes -------------
+class Scene:
+    """One screen of the app. The Director drives only the top of the stack each frame:
+    update(dt, events), then draw(), which returns the changed rects ([] = none) or None to
+    flip the whole frame. preload() does the heavy setup once, possibly long before enter();
+    enter()/exit() bracket a scene's life, suspend()/resume() the time it spends covered by
+    another scene or switched away from."""
+    director = None
+
+    def preload(self): pass
+    def enter(self): pass
+    def exit(self): pass
+    def suspend(self): pass
+    def resume(self): pass
+    def resize(self): pass      # the window changed size
+    def invalidate(self): pass  # the screen shows something else: repaint everything next draw
+    def update(self, dt, events): pass
+    def draw(self): return None
+    # None while animating (frames at full rate); else how long the scene can sleep
+    # until it needs another frame, math.inf meaning until the next input
+    def idle_timeout(self): return None
+
+class StillScene(Scene):
+    """A screen that only changes on input: drawn once per invalidate(), and the loop
+    sleeps in between."""
+    redraw = True
+
+    def invalidate(self):
+        self.redraw = True
+
+    def idle_timeout(self):
+        return math.inf
+
+class Director:
+    """The single frame loop. Every named root scene (menu, each game) keeps its own stack of
+    overlays (pause, game over); switch() moves between roots without tearing any down, so a
+    game comes back exactly as it was left. QUIT, F11, F3 and F9 (save the last 30s clip)
+    are handled here for all scenes."""
+    fps = 60
+    max_idle = 1.0  # longest single wait for input while the scene is idle
+    first_frame = None  # called with the director once the first frame is shown (--startup)
+
+    def __init__(self, scenes, start):
+        self.scenes = scenes  # name -> root scene
+        self.stacks = {}      # name -> [root, overlays...] for every root entered so far
+        self.preloaded = set()
+        self.current = None
+        self.running = False
+        for scene in scenes.values():
+            scene.director = self
+        self.switch(start)
+
+    @property
+    def top(self):
+        return self.stacks[self.current][-1]
+
+    def preload(self, name):
+        if name not in self.preloaded:
+            self.scenes[name].preload()
+            self.preloaded.add(name)
+
+    def preload_next(self):
+        # Warm one more root per call, so the first switch to it is instant
+        for name in self.scenes:
+            if name not in self.preloaded:
+                self.preload(name)
+                return
+
+    def switch(self, name):
+        if name == self.current:
+            return
+        if self.current is not None:
+            self.top.suspend()
+        self.current = name
+        if name in self.stacks:
+            self.top.resume()
+        else:
+            self.preload(name)
+            self.stacks[name] = [self.scenes[name]]
+            self.top.enter()
+        self.top.invalidate()
+
+    def push(self, scene):
+        self.top.suspend()
+        scene.director = self
+        scene.preload()
+        self.stacks[self.current].append(scene)
+        scene.enter()
+        scene.invalidate()
+
+    def pop(self):
+        self.stacks[self.current].pop().exit()
+        self.top.resume()
+        self.top.invalidate()
+
+    def quit(self):
+        self.running = False
+
+    def run(self):
+        self.running = True
+        try:
+            while self.running:
+                waited = self.wait_idle()
+                dt = clock.tick(self.fps) / 1000.0
+                profiler.begin_frame(dt)
+                events = []
+                for e in waited + pygame.event.get():
+                    if e.type == pygame.QUIT:
+                        self.quit()
+                    elif e.type == pygame.KEYDOWN and e.key == pygame.K_F11:
+                        toggle_fullscreen()
+                        for name in self.preloaded:
+                            self.scenes[name].resize()
+                        self.top.invalidate()
+                    elif e.type == pygame.KEYDOWN and e.key == pygame.K_F3:
+                        profiler.toggle_overlay()
+                    elif e.type == pygame.KEYDOWN and e.key == pygame.K_F9:
+                        recorder.save_clip()
+                    elif e.type == pygame.WINDOWEXPOSED:
+                        self.top.invalidate()
+                    elif screen is not display and hasattr(e, "pos"):
+                        events.append(pygame.event.Event(e.type, dict(e.dict, pos=to_logical(e.pos))))
+                    else:
+                        events.append(e)
+                profiler.lap("events")
+                if not self.running:
+                    break
+                self.top.update(dt, events)
+                profiler.lap("update")
+                self.present()
+                profiler.end_frame()
+                if self.first_frame:
+                    self.first_frame()
+                    self.first_frame = None
+        finally:
+            for stack in self.stacks.values():
+                for scene in reversed(stack):
+                    scene.exit()
+
+    def wait_idle(self):
+        # A static scene blocks here on input or its own timer instead of spinning at fps
+        timeout = None if profiler.overlay else self.top.idle_timeout()
+        if timeout is None:
+            return []
+        if recorder.stale:
+            timeout = min(timeout, 1.0 / recorder.fps)  # come back to capture the last change
+        e = pygame.event.wait(max(1, int(min(timeout, self.max_idle) * 1000)))
+        return [] if e.type == pygame.NOEVENT else [e]
+
+    def present(self):
+        scene = self.top
+        if profiler.overlay:
+            scene.invalidate()  # the translucent panel must not stack on itself
+        rects = scene.draw()
+        if profiler.draw(screen):
+            rects = None
+        profiler.lap("draw")
+        present(rects)
+        profiler.lap("flip")
 
 # ------------- Menu -------------
 def draw_menu(starfield, t):
@@ -104,20 +863,72 @@ def draw_menu(starfield, t):
     y = panel.y + 60
     draw_text(screen, "A - Atari Shooter", font_big, ACCENT, topleft=(panel.x + 60, y)); y += 70
     draw_text(screen, "S - Snake (1 grows, wall = death)", font_big, GREEN, topleft=(panel.x + 60, y)); y += 70
-    draw_text(screen, "T - Tic Tac Toe (local 2P)", font_big, YELLOW, topleft=(panel.x + 60, y)); y += 70
+    draw_text(screen, "T - Tic Tac Toe (2P or vs CPU)", font_big, YELLOW, topleft=(panel.x + 60, y)); y += 70
     draw_text(screen, "Q - Quit", font_big, ACCENT2, topleft=(panel.x + 60, y))
 
-    help1 = "F11: Fullscreen  •  M: Menu from any game  •  R: Restart (in game)"
+    help1 = "F11: Fullscreen  •  F3: Profiler  •  M: Menu from any game  •  R: Restart (in game)"
     draw_text(screen, help1, font_small, UI, center=(w // 2, panel.bottom + 40))
+    help2 = "Online (python gamelibs.py serve):  N - Snake  •  O - Tic Tac Toe"
+    draw_text(screen, help2, font_small, UI, center=(w // 2, panel.bottom + 70))
+
+MENU_KEYS = {pygame.K_a: "atari", pygame.K_s: "snake", pygame.K_t: "tictactoe",
+             pygame.K_n: "net-snake", pygame.K_o: "net-tictactoe"}
+
+class MenuScene(Scene):
+    attract_after = 30.0  # idle seconds before the Snake autopilot demo starts
+    stars = 220  # 0: a still menu that sleeps between inputs (--stars)
+
+    def preload(self):
+        self.starfield = Starfield(self.stars, screen.get_size())
+        self.t = 0.0
+        self.idle = 0.0
+        self.redraw = True
+
+    def invalidate(self):
+        self.redraw = True
+
+    def idle_timeout(self):
+        if self.stars or len(self.director.preloaded) < len(self.director.scenes):
+            return None
+        return max(0.0, self.attract_after - self.idle) if "demo" in self.director.scenes else math.inf
+
+    def resume(self):
+        self.idle = 0.0
+
+    def resize(self):
+        self.starfield.resize(*screen.get_size())
+
+    def update(self, dt, events):
+        for e in events:
+            if e.type == pygame.KEYDOWN:
+                if e.key in MENU_KEYS:
+                    self.director.switch(MENU_KEYS[e.key])
+                    return
+                if e.key == pygame.K_q:
+                    self.director.quit()
+        self.idle = 0.0 if events else self.idle + dt
+        if self.idle > self.attract_after and "demo" in self.director.scenes:
+            self.director.switch("demo")
+            return
+        self.t += dt
+        self.starfield.update(dt, 0.7)
+        self.director.preload_next()  # games get built while the player reads the menu
+
+    def draw(self):
+        if not (self.stars or self.redraw):
+            return []
+        self.redraw = False
+        draw_menu(self.starfield, self.t)
+        profiler.count("stars", len(self.starfield.x))
 
 # ------------- Atari shooter -------------
 class AS_Player:
-    def __init__(self):
-        self.reset()
+    def __init__(self, w=DEFAULT_SIZE[0], h=DEFAULT_SIZE[1]):
+        self.reset(w, h)
 
-    def reset(self):
-        self.x = screen.get_width() // 2
-        self.y = screen.get_height() - 70
+    def reset(self, w=DEFAULT_SIZE[0], h=DEFAULT_SIZE[1]):
+        self.x = w // 2
+        self.y = h - 70
         self.speed = 620.0   # px/s
         self.cooldown = 0.0
         self.fire_cd = 0.18
@@ -125,14 +936,10 @@ class AS_Player:
         self.score = 0
         self.invuln = 0.0
 
-    def update(self, dt, keys):
-        move = 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            move -= 1
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            move += 1
+    def update(self, dt, move, w):
+        # move: -1 left, 0 idle, +1 right
         self.x += move * self.speed * dt
-        self.x = clamp(self.x, 30, screen.get_width() - 30)
+        self.x = clamp(self.x, 30, w - 30)
         self.cooldown = max(0.0, self.cooldown - dt)
         self.invuln = max(0.0, self.invuln - dt)
 
@@ -140,8 +947,9 @@ class AS_Player:
         return self.cooldown <= 0.0
 
     def fire(self):
+        # Muzzle position; the sim spawns the bullet into its pool
         self.cooldown = self.fire_cd
-        return AS_Bullet(self.x, self.y - 22)
+        return self.x, self.y - 22
 
     def hit(self):
         if self.invuln > 0:
@@ -150,200 +958,621 @@ class AS_Player:
         self.invuln = 1.0
 
     def draw(self, t):
-        flick = 0.6 + 0.4 * math.sin(t * 7)
-        col = (int(200*flick), int(230*flick), int(255*flick))
-        pts = [
-            (int(self.x), int(self.y - 18)),
-            (int(self.x - 18), int(self.y + 18)),
-            (int(self.x + 18), int(self.y + 18)),
-        ]
         if self.invuln > 0 and int(t * 12) % 2 == 0:
-            pygame.draw.polygon(screen, WHITE, pts, width=2)
+            shade = PLAYER_SHADES
         else:
-            pygame.draw.polygon(screen, col, pts)
-
-class AS_Bullet:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.speed = 900.0
-        self.r = 4
-        self.alive = True
+            # 0.6 + 0.4*sin brightness, snapped to one of the pre-rendered shades
+            shade = round((0.4 + 0.4 * math.sin(t * 7)) / 0.8 * (PLAYER_SHADES - 1))
+        screen.blit(sprite_atlas().player(shade), (int(self.x) - 20, int(self.y) - 20))
+
+class EntityPool:
+    """Struct-of-arrays entity store: one NumPy array per field, live entities packed into [:n]."""
+    fields = {"x": np.float64, "y": np.float64, "speed": np.float64, "r": np.float64, "kind": np.uint8}
+
+    def __init__(self, capacity=64):
+        self.n = 0
+        self.capacity = 0
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.n
+
+    def _grow(self, capacity):
+        for name, dtype in self.fields.items():
+            arr = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                arr[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, arr)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.n] = True
+        self.alive = alive
+        self.capacity = capacity
+
+    def clear(self):
+        self.n = 0
+
+    def spawn(self, **cols):
+        # Bulk spawn: every column is a scalar or a same-length sequence; the
+        # sequences set the batch size (an all-scalar call spawns one)
+        sizes = [np.size(v) for v in cols.values() if np.ndim(v)]
+        k = max(sizes) if sizes else int(bool(cols))
+        if k == 0:
+            return
+        need = self.n + k
+        if need > self.capacity:
+            self._grow(max(need, self.capacity * 2))
+        end = self.n + k
+        for name in self.fields:
+            getattr(self, name)[self.n:end] = cols.get(name, 0)
+        self.alive[self.n:end] = True
+        self.n = end
+
+    def compact(self):
+        # Despawn: pack the survivors to the front, order preserved
+        n = self.n
+        keep = self.alive[:n]
+        k = int(np.count_nonzero(keep))
+        if k == n:
+            return
+        for name in self.fields:
+            arr = getattr(self, name)
+            arr[:k] = arr[:n][keep]
+        self.alive[:k] = True
+        self.n = k
 
+class BulletPool(EntityPool):
     def update(self, dt):
-        self.y -= self.speed * dt
-        if self.y < -20:
-            self.alive = False
+        n = self.n
+        y = self.y[:n]
+        y -= self.speed[:n] * dt
+        self.alive[:n] &= y >= -20
+        self.compact()
+
+class EnemyPool(EntityPool):
+    def update(self, dt, h):
+        n = self.n
+        y = self.y[:n]
+        y += self.speed[:n] * dt
+        self.x[:n] += np.sin(y * 0.02) * 50 * dt
+        self.alive[:n] &= y <= h + 40
+        self.compact()
+
+ENEMY_COLORS = (ACCENT2, YELLOW)
+ENEMY_RADII = range(12, 21)  # spawn_enemies draws r from randint(12, 20)
+PLAYER_SHADES = 32           # flicker brightness levels pre-rendered for the ship
+
+class SpriteAtlas:
+    """Every enemy variant (radius x color x dome flash) and every player frame, drawn once.
+    Each sprite is its own small RLE colorkey surface: clipping a region out of one wide RLE
+    sheet makes SDL walk the whole sheet row per blit, which is slower than the ellipses were.
+    A frame is then one Surface.blits call for the whole wave."""
+    key = (255, 0, 255)
 
-    def draw(self):
-        pygame.draw.circle(screen, ACCENT, (int(self.x), int(self.y)), self.r)
-        pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), self.r, 1)
-
-class AS_Enemy:
     def __init__(self):
-        self.x = random.uniform(40, screen.get_width() - 40)
-        self.y = -30
-        self.r = random.randint(12, 20)
-        self.speed = random.uniform(150.0, 240.0)
-        self.alive = True
-        self.color = ACCENT2 if random.random() < 0.4 else YELLOW
+        # Enemy sprites indexed [kind, flash, r - 12]; each is (2r+12) square, centered
+        self.enemies = np.empty((2, 2, len(ENEMY_RADII)), dtype=object)
+        for kind in (0, 1):
+            for flash in (0, 1):
+                for i, r in enumerate(ENEMY_RADII):
+                    self.enemies[kind, flash, i] = self._sprite(r + 6, self._draw_enemy, r, kind, flash)
+        self.e_off = np.array([r + 6 for r in ENEMY_RADII])
+        # Ship in PLAYER_SHADES flicker levels, plus the invulnerable outline last
+        self.players = [self._sprite(20, self._draw_player, i) for i in range(PLAYER_SHADES + 1)]
+
+    def _sprite(self, c, draw, *args):
+        surf = pygame.Surface((2 * c, 2 * c))
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert()
+        surf.fill(self.key)
+        draw(surf, c, c, *args)
+        surf.set_colorkey(self.key, pygame.RLEACCEL)
+        return surf
+
+    @staticmethod
+    def _draw_enemy(s, x, y, r, kind, flash):
+        color = ENEMY_COLORS[kind]
+        rect = pygame.Rect(int(x - r), int(y - r/2), int(r*2), int(r))
+        dome = pygame.Rect(int(x - r/1.6), int(y - r), int(r*1.25), int(r))
+        glow = (color[0], int(color[1]*0.7), int(color[2]*0.7))
+        pygame.draw.ellipse(s, glow, rect.inflate(10, 8), width=4)
+        pygame.draw.ellipse(s, color, rect)
+        pygame.draw.ellipse(s, (240, 240, 240), dome)
+        if flash:
+            pygame.draw.ellipse(s, WHITE, dome, 1)
+
+    @staticmethod
+    def _draw_player(s, x, y, shade):
+        pts = [(x, y - 18), (x - 18, y + 18), (x + 18, y + 18)]
+        if shade == PLAYER_SHADES:
+            pygame.draw.polygon(s, WHITE, pts, width=2)
+        else:
+            flick = 0.2 + 0.8 * shade / (PLAYER_SHADES - 1)
+            pygame.draw.polygon(s, (int(200*flick), int(230*flick), int(255*flick)), pts)
+
+    def enemy_blits(self, x, y, r, kind, flash):
+        # Arrays in, one (sprite, dest) sequence out; sprites snap to whole-pixel centers
+        ri = np.clip(np.rint(r).astype(np.int64), ENEMY_RADII[0], ENEMY_RADII[-1]) - ENEMY_RADII[0]
+        off = self.e_off[ri]
+        dx = (x.astype(np.int64) - off).tolist()
+        dy = (y.astype(np.int64) - off).tolist()
+        return zip(self.enemies[kind, int(flash), ri].tolist(), zip(dx, dy))
+
+    def player(self, shade):
+        return self.players[shade]
+
+_atlas = None
+
+def sprite_atlas():
+    global _atlas
+    if _atlas is None:
+        _atlas = SpriteAtlas()
+    return _atlas
+
+def draw_bullets(pool, lead=0.0):
+    # lead: seconds past the last sim step to extrapolate to (render interpolation)
+    n = pool.n
+    y = pool.y[:n] - pool.speed[:n] * lead
+    for x, y, r in zip(pool.x[:n].astype(int).tolist(), y.astype(int).tolist(), pool.r[:n].astype(int).tolist()):
+        pygame.draw.circle(screen, ACCENT, (x, y), r)
+        pygame.draw.circle(screen, WHITE, (x, y), r, 1)
+
+def draw_enemies(pool, t, lead=0.0):
+    n = pool.n
+    if n:
+        y = pool.y[:n] + pool.speed[:n] * lead
+        screen.blits(sprite_atlas().enemy_blits(pool.x[:n], y, pool.r[:n], pool.kind[:n], int(t*8) % 2 == 0), doreturn=False)
+
+class SpatialHash:
+    """Uniform-grid broad phase: points are bucketed into short, narrow cells once per rebuild
+    (one argsort + bincount, sorted row-major). A query's x-window within one row is then a
+    single contiguous run of the sorted points, read off a running count, so each query
+    visits a few row runs instead of every cell around it. Tiny sets return every pair."""
+    max_cells = 1 << 12    # per axis; stray far-off points clamp into the border cells
+    brute_pairs = 1 << 14  # below this many query x point pairs, skip the grid
+
+    def __init__(self, cell=(8.0, 16.0)):
+        self.cw, self.ch = cell  # cell width, row height
+        self.build(np.empty(0), np.empty(0))
+
+    def _cols(self, x):
+        return np.clip(np.floor((x - self.x0) / self.cw), 0, self.ncx - 1).astype(np.int64)
+
+    def _rows(self, y):
+        # Clamping is monotonic, so no pair within reach is lost
+        return np.clip(np.floor((y - self.y0) / self.ch), 0, self.ncy - 1).astype(np.int64)
+
+    def build(self, x, y):
+        # Bucketing is deferred to the first query that actually needs the grid
+        self.px, self.py = x, y
+        self.indexed = False
+
+    def _index(self):
+        x, y = self.px, self.py
+        self.x0, self.y0 = float(x.min()), float(y.min())
+        self.ncx = min(int((x.max() - self.x0) // self.cw) + 1, self.max_cells)
+        self.ncy = min(int((y.max() - self.y0) // self.ch) + 1, self.max_cells)
+        keys = self._rows(y) * self.ncx + self._cols(x)
+        self.order = np.argsort(keys)
+        # before[k]: points in cells < k, so cells [k, k2) hold order[before[k]:before[k2]]
+        self.before = np.zeros(self.ncx * self.ncy + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=self.ncx * self.ncy), out=self.before[1:])
+        self.indexed = True
+
+    def candidates(self, qx, qy, reach):
+        """(query index, point index) pairs whose cells lie within reach of each other, grouped by query."""
+        qx, qy = np.atleast_1d(qx), np.atleast_1d(qy)
+        nq, npts = len(qx), len(self.px)
+        if not npts or not nq:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        if nq * npts <= self.brute_pairs:
+            # Small sets: every pair is cheaper than walking cells
+            return np.repeat(np.arange(nq), npts), np.tile(np.arange(npts), nq)
+        if not self.indexed:
+            self._index()
+        top, bottom = self._rows(qy - reach), self._rows(qy + reach)
+        # Every row each query reaches at once: shape (nq, most rows any query can span)
+        step = np.arange(int(math.ceil(2 * reach / self.ch)) + 1)
+        rows = top[:, None] + step
+        valid = rows <= bottom[:, None]
+        rows = np.minimum(rows, self.ncy - 1)
+        # Each row only needs the chord of the reach circle at the row's nearest edge
+        # (the border rows also hold clamped points, so they get the full width)
+        above = (top * self.ch - (qy - self.y0))[:, None] + step * self.ch  # row top - query y
+        gap = np.maximum(np.maximum(above, -self.ch - above), 0)
+        gap[(rows == 0) | (rows == self.ncy - 1)] = 0
+        half = np.sqrt(np.maximum(reach * reach - gap * gap, 0))
+        lo = self.before[rows * self.ncx + self._cols(qx[:, None] - half)]
+        hi = self.before[rows * self.ncx + self._cols(qx[:, None] + half) + 1]
+        counts = np.where(valid, hi - lo, 0).ravel()
+        total = int(counts.sum())
+        # Run k covers output slots [end - count, end) and reads order[lo:lo + count]
+        shift = np.repeat(lo.ravel() - (np.cumsum(counts) - counts), counts)
+        owner = np.repeat(np.arange(nq), counts.reshape(nq, -1).sum(axis=1))
+        return owner, self.order[np.arange(total) + shift]
+
+def match_pairs(a, b):
+    """Greedy one-to-one matching of (a, b) pairs grouped by ascending a (b in any order):
+    the result of letting each a in turn take its lowest free b. Each round every a claims
+    its lowest b and each claimed b goes to the lowest a; matched a's and b's then drop
+    out, so the loop runs once per layer of contention."""
+    ma, mb = [], []
+    used_a = np.zeros(int(a.max()) + 1 if len(a) else 0, dtype=bool)
+    used_b = np.zeros(int(b.max()) + 1 if len(b) else 0, dtype=bool)
+    while len(a):
+        first = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        pa, pb = a[first], np.minimum.reduceat(b, first)
+        # Each claimed b goes to the lowest a claiming it (pa ascends, so lowest = first)
+        low = np.full(len(used_b), len(pb))
+        np.minimum.at(low, pb, np.arange(len(pb)))
+        win = np.flatnonzero(low[pb] == np.arange(len(pb)))
+        ma.append(pa[win])
+        mb.append(pb[win])
+        used_a[pa[win]] = True
+        used_b[pb[win]] = True
+        keep = ~(used_a[a] | used_b[b])
+        a, b = a[keep], b[keep]
+    if not ma:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(ma), np.concatenate(mb)
+
+class AtariSim:
+    """Display-free shooter world. Step it with explicit input; AtariScene only draws it."""
+    dt = 1 / 60        # fixed simulation step (s): one per frame; bullets close at most 19 px a step, under any hit diameter
+    spawn_every = 0.7  # seconds between enemy spawns
+    bullet_speed = 900.0
+    bullet_r = 4
+
+    def __init__(self, w=DEFAULT_SIZE[0], h=DEFAULT_SIZE[1], seed=None):
+        self.w, self.h = w, h
+        self.seed = seed
+        self.rng = random.Random(seed)  # per-game, so a seed + inputs replay exactly
+        self.bullets = BulletPool()
+        self.enemies = EnemyPool()
+        self.bullet_grid = SpatialHash()
+        self.reset()
 
-    def update(self, dt):
-        self.y += self.speed * dt
-        self.x += math.sin(self.y * 0.02) * 50 * dt
-        if self.y > screen.get_height() + 40:
-            self.alive = False
+    def reset(self):
+        self.player = AS_Player(self.w, self.h)
+        self.bullets.clear()
+        self.enemies.clear()
+        self.spawn_accum = 0.0
+        self.score = 0
+        self.t = 0.0
 
-    def draw(self, t):
-        rect = pygame.Rect(int(self.x - self.r), int(self.y - self.r/2), int(self.r*2), int(self.r))
-        dome = pygame.Rect(int(self.x - self.r/1.6), int(self.y - self.r), int(self.r*1.25), int(self.r))
-        glow = (self.color[0], int(self.color[1]*0.7), int(self.color[2]*0.7))
-        pygame.draw.ellipse(screen, glow, rect.inflate(10, 8), width=4)
-        pygame.draw.ellipse(screen, self.color, rect)
-        pygame.draw.ellipse(screen, (240, 240, 240), dome)
-        if int(t*8) % 2 == 0:
-            pygame.draw.ellipse(screen, WHITE, dome, 1)
-
-def run_atari():
-    star = Starfield(200)
-    player = AS_Player()
-    bullets = []
-    enemies = []
-    spawn_accum = 0.0
-    score = 0
-    paused = False
-    t_global = 0.0
-
-    while True:
-        dt = clock.tick(60) / 1000.0
-        t_global += dt
-        events = pygame.event.get()
+    def resize(self, w, h):
+        self.w, self.h = w, h
+
+    @property
+    def game_over(self):
+        return self.player.lives <= 0
+
+    def spawn_enemies(self, k):
+        rows = []
+        for _ in range(k):
+            x = self.rng.uniform(40, self.w - 40)
+            r = self.rng.randint(12, 20)
+            speed = self.rng.uniform(150.0, 240.0)
+            kind = 0 if self.rng.random() < 0.4 else 1
+            rows.append((x, r, speed, kind))
+        x, r, speed, kind = zip(*rows)
+        self.enemies.spawn(x=x, y=-30.0, r=r, speed=speed, kind=kind)
+
+    def spawn_bullets(self, xs, ys):
+        self.bullets.spawn(x=xs, y=ys, speed=self.bullet_speed, r=self.bullet_r)
+
+    def step(self, dt, move=0, fire=False):
+        if self.game_over:
+            return
+        self.t += dt
+        player = self.player
+        player.update(dt, move, self.w)
+
+        if fire and player.can_fire():
+            self.spawn_bullets(*player.fire())
+
+        self.bullets.update(dt)
+
+        self.spawn_accum += dt
+        # Spawn approx every 0.7s scaled with time
+        k = int(self.spawn_accum // self.spawn_every)
+        if k:
+            self.spawn_enemies(k)
+            self.spawn_accum -= k * self.spawn_every
+
+        self.enemies.update(dt, self.h)
+        profiler.lap("update")
+        self.collide()
+        profiler.lap("collision")
+
+    def find_hits(self):
+        """One batch of this frame's hits: (shot enemies, spent bullets, enemies that rammed the player)."""
+        en, bl, player = self.enemies, self.bullets, self.player
+        ne, nb = en.n, bl.n
+        shot = spent = np.empty(0, dtype=np.int64)
+        rammed = []
+
+        # Bullets vs enemies: bullets go in the grid, enemies query it
+        if ne and nb:
+            self.bullet_grid.build(bl.x[:nb], bl.y[:nb])
+            reach = en.r[:ne].max() + bl.r[:nb].max() + 2
+            ei, bi = self.bullet_grid.candidates(en.x[:ne], en.y[:ne], reach)
+            dx = en.x[ei] - bl.x[bi]
+            dy = en.y[ei] - bl.y[bi]
+            lim = en.r[ei] + bl.r[bi] + 2
+            near = dx*dx + dy*dy <= lim*lim
+            shot, spent = match_pairs(ei[near], bi[near])
+
+        # Enemies vs player: one query point, so a straight distance test over every enemy
+        if ne:
+            dx = en.x[:ne] - player.x
+            dy = en.y[:ne] - player.y
+            lim = en.r[:ne] + 18
+            near = dx*dx + dy*dy <= lim*lim
+            near[shot] = False
+            rammed = np.flatnonzero(near).tolist()
+
+        return shot, spent, rammed
+
+    def collide(self):
+        shot, spent, rammed = self.find_hits()
+        self.enemies.alive[shot] = False
+        self.bullets.alive[spent] = False
+        self.score += 10 * len(shot)
+        for i in rammed:
+            self.enemies.alive[i] = False
+            self.player.hit()
+            if self.game_over:
+                break
+
+        self.enemies.compact()
+        self.bullets.compact()
+
+def atari_input(keys):
+    move = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        move -= 1
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        move += 1
+    return move, bool(keys[pygame.K_SPACE])
+
+def draw_atari(sim, star, lead=0.0):
+    screen.fill(BLACK)
+    star.draw(screen)
+    # HUD bar
+    pygame.draw.rect(screen, DEEP, (0, 0, screen.get_width(), 60))
+    pygame.draw.line(screen, (70, 80, 100), (0, 60), (screen.get_width(), 60), 2)
+    draw_counter(screen, "Score: ", sim.score, font_med, UI, (16, 16))
+    draw_counter(screen, "Lives: ", sim.player.lives, font_med, UI, (180, 16))
+    draw_text(screen, "M: Menu  •  Space: Shoot", font_small, UI, topleft=(screen.get_width() - 260, 20))
+
+    draw_bullets(sim.bullets, lead)
+    draw_enemies(sim.enemies, sim.t, lead)
+    sim.player.draw(sim.t)
+
+class AtariScene(Scene):
+    log = None  # opened on enter(), so preloading never leaves an empty replay behind
+
+    def preload(self):
+        sprite_atlas()
+        self.star = Starfield(200, screen.get_size())
+        self.built_at = screen.get_size()
+        self.sim = AtariSim(*self.built_at, seed=random.getrandbits(63))
+        self.ticker = FixedStep(AtariSim.dt)
+
+    def enter(self):
+        # The header holds the size the sim was built at; a resize since preload
+        # (F11 on the menu) goes in as the first tick's resize, as the sim saw it
+        self.log = InputLog.session("atari", self.sim.seed, self.built_at)
+        if screen.get_size() != self.built_at:
+            self.log.resize(*screen.get_size())
+
+    def exit(self):
+        self.log.close()
+
+    def resume(self):
+        self.ticker.reset()
+
+    def resize(self):
+        self.sim.resize(*screen.get_size())
+        self.star.resize(*screen.get_size())
+        if self.log:
+            self.log.resize(*screen.get_size())
+
+    def restart(self):
+        self.sim.reset()
+        self.log.restart()
+        self.ticker.reset()
+
+    def update(self, dt, events):
+        sim = self.sim
         for e in events:
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
             if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_F11:
-                    toggle_fullscreen()
-                elif e.key == pygame.K_m:
+                if e.key == pygame.K_m:
+                    # Left mid-game: it waits paused for the player to come back
+                    self.director.push(PauseScene(self))
+                    self.director.switch("menu")
                     return
-                elif e.key in (pygame.K_ESCAPE, pygame.K_p):
-                    paused = not paused
-                elif e.key == pygame.K_r and not paused:
-                    # quick restart
-                    player = AS_Player()
-                    bullets.clear()
-                    enemies.clear()
-                    score = 0
-
-        if paused:
-            # Draw paused overlay
-            screen.fill(BLACK)
-            star.draw(screen)
-            draw_text(screen, "Paused", font_big, UI, center=(screen.get_width()//2, screen.get_height()//2 - 20))
-            draw_text(screen, "P/Esc: Resume  •  M: Menu", font_med, UI, center=(screen.get_width()//2, screen.get_height()//2 + 30))
-            pygame.display.flip()
-            continue
+                if e.key in (pygame.K_ESCAPE, pygame.K_p):
+                    self.director.push(PauseScene(self))
+                    return
+                if e.key == pygame.K_r:
+                    self.restart()
+
+        self.star.update(dt, 1.0)
+        move, fire = atari_input(pygame.key.get_pressed())
+        profiler.lap("input")
+        for _ in range(self.ticker.advance(dt)):
+            self.log.tick(atari_bits(move, fire))
+            sim.step(sim.dt, move, fire)
+        if sim.game_over:
+            self.director.push(GameOverScene(self))
 
-        keys = pygame.key.get_pressed()
+    def draw(self):
+        draw_atari(self.sim, self.star, self.ticker.alpha * self.sim.dt)
+        profiler.count("enemies", self.sim.enemies.n)
+        profiler.count("bullets", self.sim.bullets.n)
 
-        # Update world
-        star.update(dt, 1.0)
-        player.update(dt, keys)
+class PauseScene(StillScene):
+    def __init__(self, game):
+        self.game = game
 
-        if (keys[pygame.K_SPACE]) and player.can_fire():
-            bullets.append(player.fire())
+    def update(self, dt, events):
+        for e in events:
+            if e.type == pygame.KEYDOWN:
+                if e.key in (pygame.K_ESCAPE, pygame.K_p):
+                    self.director.pop()
+                    return
+                if e.key == pygame.K_m:
+                    self.director.switch("menu")
+                    return
 
-        for b in bullets:
-            b.update(dt)
-        bullets = [b for b in bullets if b.alive]
+    def draw(self):
+        if not self.redraw:
+            return []
+        self.redraw = False
+        screen.fill(BLACK)
+        self.game.star.draw(screen)
+        draw_text(screen, "Paused", font_big, UI, center=(screen.get_width()//2, screen.get_height()//2 - 20))
+        draw_text(screen, "P/Esc: Resume  •  M: Menu", font_med, UI, center=(screen.get_width()//2, screen.get_height()//2 + 30))
 
-        spawn_accum += dt
-        # Spawn approx every 0.7s scaled with time
-        while spawn_accum >= 0.7:
-            enemies.append(AS_Enemy())
-            spawn_accum -= 0.7
-
-        for en in enemies:
-            en.update(dt)
-        enemies = [e for e in enemies if e.alive]
-
-        # Collisions: bullets vs enemies
-        for en in enemies[:]:
-            for b in bullets[:]:
-                dx = en.x - b.x
-                dy = en.y - b.y
-                if dx*dx + dy*dy <= (en.r + b.r + 2)**2:
-                    enemies.remove(en)
-                    b.alive = False
-                    score += 10
-                    break
+class GameOverScene(StillScene):
+    def __init__(self, game):
+        self.game = game
 
-        # Collisions: enemies vs player
-        for en in enemies[:]:
-            dx = en.x - player.x
-            dy = en.y - player.y
-            if dx*dx + dy*dy <= (en.r + 18)**2:
-                enemies.remove(en)
-                player.hit()
-                if player.lives <= 0:
-                    # Game over screen
-                    while True:
-                        dt_go = clock.tick(60) / 1000.0
-                        for e in pygame.event.get():
-                            if e.type == pygame.QUIT:
-                                pygame.quit(); sys.exit()
-                            if e.type == pygame.KEYDOWN:
-                                if e.key == pygame.K_m:
-                                    return
-                                if e.key in (pygame.K_RETURN, pygame.K_SPACE, pygame.K_r):
-                                    player = AS_Player()
-                                    bullets.clear()
-                                    enemies.clear()
-                                    score = 0
-                                    break
-                                if e.key == pygame.K_F11:
-                                    toggle_fullscreen()
-                        else:
-                            # Draw game over
-                            screen.fill(BLACK)
-                            star.draw(screen)
-                            draw_text(screen, "Game Over", font_title, ACCENT2, center=(screen.get_width()//2, int(screen.get_height()*0.35)))
-                            draw_text(screen, f"Score: {score}", font_big, UI, center=(screen.get_width()//2, int(screen.get_height()*0.48)))
-                            draw_text(screen, "Enter/Space/R: Restart   •   M: Menu", font_med, UI, center=(screen.get_width()//2, int(screen.get_height()*0.60)))
-                            pygame.display.flip()
-                            continue
-                        break
-
-        # Draw
-        screen.fill(BLACK)
-        star.draw(screen)
-        # HUD bar
-        pygame.draw.rect(screen, DEEP, (0, 0, screen.get_width(), 60))
-        pygame.draw.line(screen, (70, 80, 100), (0, 60), (screen.get_width(), 60), 2)
-        draw_text(screen, f"Score: {score}", font_med, UI, topleft=(16, 16))
-        draw_text(screen, f"Lives: {player.lives}", font_med, UI, topleft=(180, 16))
-        draw_text(screen, "M: Menu  •  Space: Shoot", font_small, UI, topleft=(screen.get_width() - 260, 20))
-
-        for b in bullets: b.draw()
-        for en in enemies: en.draw(t_global)
-        player.draw(t_global)
+    def update(self, dt, events):
+        for e in events:
+            if e.type == pygame.KEYDOWN:
+                if e.key in (pygame.K_RETURN, pygame.K_SPACE, pygame.K_r):
+                    self.game.restart()
+                    self.director.pop()
+                    return
+                if e.key == pygame.K_m:
+                    self.director.switch("menu")
+                    return
 
-        pygame.display.flip()
+    def draw(self):
+        if not self.redraw:
+            return []
+        self.redraw = False
+        screen.fill(BLACK)
+        self.game.star.draw(screen)
+        draw_text(screen, "Game Over", font_title, ACCENT2, center=(screen.get_width()//2, int(screen.get_height()*0.35)))
+        draw_text(screen, f"Score: {self.game.sim.score}", font_big, UI, center=(screen.get_width()//2, int(screen.get_height()*0.48)))
+        draw_text(screen, "Enter/Space/R: Restart   •   M: Menu", font_med, UI, center=(screen.get_width()//2, int(screen.get_height()*0.60)))
 
 # ------------- Snake -------------
+DIRS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+class FreeCells:
+    """Indexed set of the free cells of a cols x rows grid (cell id = y*cols + x).
+    take/release/choice are O(1): cells live in a dense list and slot[] maps each
+    cell to its position there (-1 when occupied), so removal is a swap with the last."""
+    def __init__(self, cols, rows):
+        self.cols, self.rows = cols, rows
+        self.cells = list(range(cols * rows))
+        self.slot = list(range(cols * rows))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def id(self, x, y):
+        return y * self.cols + x
+
+    def is_free(self, c):
+        return self.slot[c] >= 0
+
+    def take(self, c):
+        i = self.slot[c]
+        if i < 0:
+            return
+        last = self.cells.pop()
+        if last != c:
+            self.cells[i] = last
+            self.slot[last] = i
+        self.slot[c] = -1
+
+    def release(self, c):
+        if self.slot[c] >= 0:
+            return
+        self.slot[c] = len(self.cells)
+        self.cells.append(c)
+
+    def choice(self, rng=random):
+        c = self.cells[rng.randrange(len(self.cells))]
+        return c % self.cols, c // self.cols
+
+def cycle_dir(x, y, cols, rows):
+    """Direction from (x, y) along a fixed Hamiltonian cycle of a cols x rows grid:
+    serpentine rows over columns 1.., returning up column 0. Needs an even side;
+    with both sides odd the last row is left off the cycle and just leads back onto it."""
+    if rows % 2 and not cols % 2:
+        dy, dx = cycle_dir(y, x, rows, cols)
+        return dx, dy
+    if rows % 2:
+        rows -= 1
+        if y >= rows:
+            return (0, -1)
+    if x == 0:
+        return (0, -1) if y > 0 else (1, 0)
+    if y % 2 == 0:
+        return (1, 0) if x < cols - 1 else (0, 1)
+    if x > 1 or y == rows - 1:
+        return (-1, 0)
+    return (0, 1)
+
+def cycle_order(cols, rows):
+    """Position of every cell along cycle_dir's cycle, as a rows x cols array (-1 = off it)."""
+    if rows % 2 and not cols % 2:
+        return cycle_order(rows, cols).T
+    even = rows - rows % 2
+    x = np.arange(cols)[None, :]
+    y = np.arange(rows)[:, None]
+    row = 1 + y * (cols - 1)  # rows are walked over columns 1.., alternating direction
+    order = np.where(y % 2 == 0, row + x - 1, row + cols - 1 - x)
+    order[:, 0] = even * (cols - 1) + even - np.arange(rows)  # then back up column 0
+    order[0, 0] = 0
+    order[even:] = -1
+    return order
+
 class SnakeGame:
-    def __init__(self):
+    step_interval = 0.11  # movement speed (s per step)
+
+    def __init__(self, w=DEFAULT_SIZE[0], h=DEFAULT_SIZE[1], seed=None):
         self.cell = 25  # cell size
+        self.w, self.h = w, h
+        self.seed = seed
+        self.rng = random.Random(seed)  # per-game, so a seed + inputs replay exactly
+        self.background = LayerCache(self.render_background)
         self.reset()
 
     def grid_size(self):
-        cols = screen.get_width() // self.cell
-        rows = (screen.get_height() - 60) // self.cell  # reserve top HUD
+        cols = self.w // self.cell
+        rows = (self.h - HUD_H) // self.cell  # reserve top HUD
         return cols, rows
 
+    def resize(self, w, h):
+        self.w, self.h = w, h
+        self.redraw = True
+        if self.grid_size() != (self.free.cols, self.free.rows):
+            self.index_cells()
+
+    def index_cells(self):
+        # Rebuild the free-cell index for the current grid (reset/resize only)
+        cols, rows = self.grid_size()
+        self.free = FreeCells(cols, rows)
+        for x, y in self.snake:
+            if 0 <= x < cols and 0 <= y < rows:
+                self.free.take(self.free.id(x, y))
+
     def reset(self):
         cols, rows = self.grid_size()
-        self.snake = [(cols // 2, rows // 2)]
+        # Body as a deque (head at [0]); occupancy lives in the free-cell index
+        self.snake = deque([(cols // 2, rows // 2)])
+        self.index_cells()
+        self.redraw = True  # renderer: full repaint pending
+        self.dirty = []     # renderer: cells touched since the last present
         self.dir = (1, 0)
         self.grow = 0
         self.alive = True
@@ -351,18 +1580,21 @@ class SnakeGame:
         self.score = 0
 
     def spawn_food(self):
-        cols, rows = self.grid_size()
-        while True:
-            pos = (random.randint(0, cols - 1), random.randint(0, rows - 1))
-            if pos not in self.snake:
-                self.food = pos
-                break
+        # Uniform over free cells, O(1) however long the snake is
+        self.food = self.free.choice(self.rng) if len(self.free) else None
+        if self.food is not None:
+            self.dirty.append(self.food)
+
+    def turn(self, d):
+        # Reversing straight into the neck is ignored
+        if d != (-self.dir[0], -self.dir[1]):
+            self.dir = d
 
     def handle_key(self, key):
-        if key == pygame.K_UP and self.dir != (0, 1): self.dir = (0, -1)
-        elif key == pygame.K_DOWN and self.dir != (0, -1): self.dir = (0, 1)
-        elif key == pygame.K_LEFT and self.dir != (1, 0): self.dir = (-1, 0)
-        elif key == pygame.K_RIGHT and self.dir != (-1, 0): self.dir = (1, 0)
+        if key == pygame.K_UP: self.turn((0, -1))
+        elif key == pygame.K_DOWN: self.turn((0, 1))
+        elif key == pygame.K_LEFT: self.turn((-1, 0))
+        elif key == pygame.K_RIGHT: self.turn((1, 0))
         elif key == pygame.K_1: self.grow += 1
         elif key == pygame.K_r and not self.alive: self.reset()
 
@@ -375,13 +1607,23 @@ class SnakeGame:
         # Wall death
         if nx < 0 or nx >= cols or ny < 0 or ny >= rows:
             self.alive = False
+            self.redraw = True
             return
 
-        if (nx, ny) in self.snake:
+        c = self.free.id(nx, ny)
+        if not self.free.is_free(c):
             self.alive = False
+            self.redraw = True
             return
 
-        self.snake.insert(0, (nx, ny))
+        self.snake.appendleft((nx, ny))
+        self.free.take(c)
+        if len(self.dirty) > 512:
+            # Nobody is presenting (headless/turbo): stop collecting, repaint fully later
+            self.dirty.clear()
+            self.redraw = True
+        self.dirty.append((hx, hy))
+        self.dirty.append((nx, ny))
 
         if (nx, ny) == self.food:
             self.grow += 1
@@ -391,33 +1633,55 @@ class SnakeGame:
         if self.grow > 0:
             self.grow -= 1
         else:
-            self.snake.pop()
-
-    def draw(self):
-        w = screen.get_width()
-        h = screen.get_height()
+            tx, ty = self.snake.pop()
+            self.dirty.append((tx, ty))
+            if 0 <= tx < cols and 0 <= ty < rows:
+                self.free.release(self.free.id(tx, ty))
+
+    def render_background(self, size):
+        w, h = size
+        bg = pygame.Surface(size).convert()
         # HUD
-        pygame.draw.rect(screen, DEEP, (0, 0, w, 60))
-        pygame.draw.line(screen, (70, 80, 100), (0, 60), (w, 60), 2)
-        draw_text(screen, f"Score: {self.score}", font_med, UI, topleft=(16, 16))
-        draw_text(screen, "1: Grow  •  R: Restart  •  M: Menu", font_small, UI, topleft=(w - 300, 20))
+        pygame.draw.rect(bg, DEEP, (0, 0, w, 60))
+        pygame.draw.line(bg, (70, 80, 100), (0, 60), (w, 60), 2)
+        draw_text(bg, "1: Grow  •  P: Autopilot  •  R: Restart  •  M: Menu", font_small, UI, topleft=(w - 470, 20))
 
         # Field
         field_rect = pygame.Rect(0, 60, w, h - 60)
-        pygame.draw.rect(screen, (14, 16, 22), field_rect)
+        pygame.draw.rect(bg, (14, 16, 22), field_rect)
 
         # Grid (subtle)
         cols, rows = self.grid_size()
         for c in range(cols):
             x = c * self.cell
-            pygame.draw.line(screen, (24, 28, 36), (x, 60), (x, h), 1)
+            pygame.draw.line(bg, (24, 28, 36), (x, 60), (x, h), 1)
         for r in range(rows + 1):
             y = 60 + r * self.cell
-            pygame.draw.line(screen, (24, 28, 36), (0, y), (w, y), 1)
+            pygame.draw.line(bg, (24, 28, 36), (0, y), (w, y), 1)
+        return bg
+
+    def cell_rect(self, x, y):
+        return pygame.Rect(x * self.cell, 60 + y * self.cell, self.cell, self.cell)
+
+    def draw_cell(self, x, y):
+        if (x, y) == self.food:
+            pygame.draw.rect(screen, RED, self.cell_rect(x, y))
+        cols, rows = self.grid_size()
+        if 0 <= x < cols and 0 <= y < rows and not self.free.is_free(self.free.id(x, y)):
+            col = GREEN if (x, y) == self.snake[0] else (0, 160, 0)
+            rect = pygame.Rect(x * self.cell + 2, 60 + y * self.cell + 2, self.cell - 4, self.cell - 4)
+            pygame.draw.rect(screen, col, rect, border_radius=6)
+
+    def draw(self):
+        w = screen.get_width()
+        h = screen.get_height()
+        screen.blit(self.background.get((w, h)), (0, 0))
+        draw_counter(screen, "Score: ", self.score, font_med, UI, (16, 16))
 
         # Food
-        fx, fy = self.food
-        pygame.draw.rect(screen, RED, (fx * self.cell, 60 + fy * self.cell, self.cell, self.cell))
+        if self.food is not None:
+            fx, fy = self.food
+            pygame.draw.rect(screen, RED, (fx * self.cell, 60 + fy * self.cell, self.cell, self.cell))
 
         # Snake
         for i, (x, y) in enumerate(self.snake):
@@ -426,162 +1690,1960 @@ class SnakeGame:
             pygame.draw.rect(screen, col, rect, border_radius=6)
 
         if not self.alive:
-            overlay = pygame.Surface((w, h), pygame.SRCALPHA)
-            overlay.fill((10, 12, 18, 200))
-            screen.blit(overlay, (0, 0))
+            shade(screen, (10, 12, 18), 200)
             draw_text(screen, "Game Over!", font_big, UI, center=(w // 2, h // 2 - 20))
             draw_text(screen, "Press R to Restart or M for Menu", font_med, UI, center=(w // 2, h // 2 + 30))
 
-def run_snake():
-    game = SnakeGame()
-    step_timer = 0.0
-    step_interval = 0.11  # movement speed
-
-    while True:
-        dt = clock.tick(60) / 1000.0
-        step_timer += dt
+    def present(self):
+        """Bring the screen up to date and return the rects that changed ([] when nothing did)."""
+        size = screen.get_size()
+        if self.redraw or self.background.size != size:
+            self.draw()
+            self.redraw = False
+            self.dirty.clear()
+            self.drawn_score = self.score
+            return [screen.get_rect()]
+        bg = self.background.surf
+        rects = []
+        for x, y in self.dirty:
+            rects.append(restore(screen, bg, self.cell_rect(x, y)))
+            self.draw_cell(x, y)
+        self.dirty.clear()
+        if self.score != self.drawn_score:
+            rects.append(restore(screen, bg, HUD_STATUS))
+            draw_counter(screen, "Score: ", self.score, font_med, UI, (16, 16))
+            self.drawn_score = self.score
+        return rects
+
+class SnakePilot:
+    """Autopilot: choose(game) returns the direction for the next step. Boards up to
+    bfs_cells go toward the food along a NumPy BFS distance field, taking the closest move
+    after which the head can still reach the tail. Bigger boards, and any decision that
+    runs out of its time budget, ride the Hamiltonian cycle of cycle_dir, cutting across
+    toward the food only where the shortcut can't overtake the tail. BFS moves can circle
+    without ever reaching the food, so a board that goes cols*rows steps without eating
+    rides the cycle, which passes every cell, until it eats again."""
+    bfs_cells = 2500
+
+    def __init__(self, budget=0.005):
+        self.budget = budget  # seconds per decision; None = unbounded, so headless runs stay reproducible
+        self.cycles = {}      # (cols, rows) -> (position of each cell along the cycle, cycle length)
+        self.reset()
 
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+    def reset(self):
+        self.seen = None  # (game, score) at the last food, and the steps chosen since
+        self.idle = 0
+
+    def stalled(self, game, laps=1):
+        """Whether the game has gone `laps` board sizes of steps without food."""
+        cols, rows = game.grid_size()
+        return self.idle > laps * cols * rows
+
+    def choose(self, game):
+        if (id(game), game.score) != self.seen:
+            self.seen, self.idle = (id(game), game.score), 0
+        self.idle += 1
+        cols, rows = game.grid_size()
+        hx, hy = game.snake[0]
+        if not (hx < cols and hy < rows):
+            return game.dir  # a shrunk window left the head off the board: it dies this step
+        if cols * rows <= self.bfs_cells and not self.stalled(game):
+            deadline = None if self.budget is None else time.perf_counter() + self.budget
+            try:
+                return self.bfs_move(game, cols, rows, deadline)
+            except SearchTimeout:
+                pass
+        return self.checked(game, self.cycle_move(game, cols, rows), cols, rows)
+
+    def bfs_move(self, game, cols, rows, deadline):
+        snake = game.snake
+        hx, hy = snake[0]
+        free = np.asarray(game.free.slot).reshape(rows, cols) >= 0  # the tail's cell counts as taken, as in step()
+        back = (-game.dir[0], -game.dir[1])
+        moves = [(d, hx + d[0], hy + d[1]) for d in DIRS if d != back]
+        moves = [m for m in moves if 0 <= m[1] < cols and 0 <= m[2] < rows and free[m[2], m[1]]]
+        if not moves:
+            return game.dir
+        if game.food is not None and game.food[0] < cols and game.food[1] < rows:
+            rings = self.flood(free, game.food, deadline, [m[1:] for m in moves])[0]
+            order = sorted(range(len(moves)), key=lambda i: rings[i] if rings[i] >= 0 else cols * rows)
+            moves = [moves[i] for i in order]
+        best = 0
+        try:
+            for best, (d, x, y) in enumerate(moves):
+                if self.tail_reachable(game, free, x, y, deadline):
+                    return d
+            # Every move can trap us: take the one with the most room
+            best = 0
+            return max(moves, key=lambda m: np.count_nonzero(self.flood(free, m[1:], deadline)[1]))[0]
+        except SearchTimeout:
+            return moves[best][0]  # out of time: the best move not yet ruled out
+
+    def tail_reachable(self, game, free, x, y, deadline):
+        snake = game.snake
+        rows, cols = free.shape
+        if len(snake) < 2:
+            return True
+        after = free.copy()
+        after[y, x] = False
+        if (x, y) == game.food or game.grow > 0:
+            tail = snake[-1]  # growing: the tail stays put this step
+        else:
+            tail = snake[-2]
+            if snake[-1][0] < cols and snake[-1][1] < rows:
+                after[snake[-1][1], snake[-1][0]] = True
+        if not (tail[0] < cols and tail[1] < rows):
+            return True  # cut off by a shrunk window: that part of the body drops off as it moves
+        after[tail[1], tail[0]] = True  # it will have moved on by the time the head gets there
+        return self.flood(after, (x, y), deadline, [tail])[0][0] >= 0
+
+    @staticmethod
+    def flood(free, src, deadline, stop=()):
+        """Vectorized BFS over the `free` mask (rows x cols) from src=(x, y), one dilation per
+        ring. Returns the ring at which each `stop` cell was reached (-1 = never) and the
+        reached mask; ends as soon as every stop cell is reached."""
+        rows, cols = free.shape
+        # One cell of padding, so a ring's four neighbour shifts are plain slices
+        open_ = np.zeros((rows + 2, cols + 2), dtype=bool)
+        open_[1:-1, 1:-1] = free
+        front = np.zeros_like(open_)
+        front[src[1] + 1, src[0] + 1] = True
+        open_[src[1] + 1, src[0] + 1] = False
+        reached = front.copy()
+        rings = [-1] * len(stop)
+        left = len(stop)
+        ring = 0
+        while True:
+            for i, (x, y) in enumerate(stop):
+                if rings[i] < 0 and front[y + 1, x + 1]:
+                    rings[i] = ring
+                    left -= 1
+            if stop and not left:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout
+            grow = front[:-2, 1:-1] | front[2:, 1:-1] | front[1:-1, :-2] | front[1:-1, 2:]
+            front = np.zeros_like(open_)
+            np.logical_and(grow, open_[1:-1, 1:-1], out=front[1:-1, 1:-1])
+            if not front.any():
+                break
+            open_ &= ~front
+            reached |= front
+            ring += 1
+        return rings, reached[1:-1, 1:-1]
+
+    def cycle(self, cols, rows):
+        if (cols, rows) not in self.cycles:
+            order = cycle_order(cols, rows)
+            self.cycles[cols, rows] = order, int(order.max()) + 1
+        return self.cycles[cols, rows]
+
+    def cycle_move(self, game, cols, rows):
+        snake = game.snake
+        hx, hy = snake[0]
+        step = cycle_dir(hx, hy, cols, rows)
+        order, n = self.cycle(cols, rows)
+        h = order[hy, hx]
+        tx, ty = snake[-1]
+        if h < 0 or 2 * len(snake) > n or not (tx < cols and ty < rows):
+            return step  # off the cycle, too long for shortcuts to be safe, or cut off by a resize
+        # The body lies along the cycle behind the head: a shortcut may skip ahead
+        # as long as it lands short of the tail, with slack for pending growth
+        room = (order[ty, tx] - h) % n or n
+        fx, fy = game.food or (cols, rows)
+        food = (order[fy, fx] - h) % n if fx < cols and fy < rows else 1
+        best, best_ahead = step, 1
+        for d in DIRS:
+            x, y = hx + d[0], hy + d[1]
+            if not (0 <= x < cols and 0 <= y < rows) or order[y, x] < 0:
+                continue
+            ahead = (order[y, x] - h) % n
+            if best_ahead < ahead <= food and ahead < room - game.grow - 3 and game.free.is_free(game.free.id(x, y)):
+                best, best_ahead = d, ahead
+        return best
+
+    @staticmethod
+    def checked(game, d, cols, rows):
+        # Last line of defence for a body that isn't laid along the cycle (pilot switched
+        # on mid-game): never step into a wall or the body if any other move is open
+        hx, hy = game.snake[0]
+        for move in (d,) + DIRS:
+            x, y = hx + move[0], hy + move[1]
+            if move != (-game.dir[0], -game.dir[1]) and 0 <= x < cols and 0 <= y < rows and game.free.is_free(game.free.id(x, y)):
+                return move
+        return d
+
+class SnakeScene(Scene):
+    log = None  # opened on enter()
+
+    def preload(self):
+        self.built_at = screen.get_size()
+        self.game = SnakeGame(*self.built_at, seed=random.getrandbits(63))
+        self.ticker = FixedStep(SnakeGame.step_interval, max_steps=3)
+        self.presses = 0  # "1" presses since the last logged tick
+        self.pilot = None
+
+    def enter(self):
+        self.log = InputLog.session("snake", self.game.seed, self.built_at)  # as AtariScene.enter
+        if screen.get_size() != self.built_at:
+            self.log.resize(*screen.get_size())
+
+    def exit(self):
+        self.log.close()
+
+    def resume(self):
+        self.ticker.reset()
+
+    def resize(self):
+        self.game.resize(*screen.get_size())
+        if self.log:
+            self.log.resize(*screen.get_size())
+
+    def invalidate(self):
+        self.game.redraw = True
+
+    def idle_timeout(self):
+        return None if self.game.alive else math.inf  # game over: a still frame until R/M
+
+    def update(self, dt, events):
+        game = self.game
+        for e in events:
             if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_F11: toggle_fullscreen()
-                elif e.key == pygame.K_m: return
-                else: game.handle_key(e.key)
-
-        if step_timer >= step_interval:
+                if e.key == pygame.K_m:
+                    self.director.switch("menu")
+                    return
+                if e.key == pygame.K_r and not game.alive:
+                    self.log.restart()
+                    self.presses = 0  # reset() drops pending growth
+                    self.ticker.reset()
+                    dt = 0.0  # time slept on the game-over screen is not game time
+                elif e.key == pygame.K_1:
+                    self.presses += 1
+                elif e.key == pygame.K_p:
+                    self.pilot = None if self.pilot else SnakePilot()
+                game.handle_key(e.key)
+
+        for _ in range(self.ticker.advance(dt)):
+            if self.pilot and game.alive:
+                game.turn(self.pilot.choose(game))  # before the log, which records the direction
+            self.log.tick(snake_bits(game, self.presses))
+            self.presses = 0
             game.step()
-            step_timer = 0.0
 
-        screen.fill(BLACK)
-        game.draw()
-        pygame.display.flip()
+    def draw(self):
+        profiler.count("length", len(self.game.snake))
+        return self.game.present()
+
+class DemoScene(Scene):
+    """Attract mode: the autopilot plays Snake until a key or click. Nothing is logged."""
+    restart_after = 2.0
+    label = "DEMO  •  any key: Menu"
+
+    def preload(self):
+        self.game = SnakeGame(*screen.get_size())
+        self.ticker = FixedStep(SnakeGame.step_interval, max_steps=3)
+        self.pilot = SnakePilot()
+
+    def enter(self):
+        self.resume()
+
+    def resume(self):
+        self.game.reset()
+        self.pilot.reset()
+        self.ticker.reset()
+        self.dead_for = 0.0
+
+    def resize(self):
+        self.game.resize(*screen.get_size())
+
+    def invalidate(self):
+        self.game.redraw = True
+
+    def update(self, dt, events):
+        if any(e.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN) for e in events):
+            self.director.switch("menu")
+            return
+        game = self.game
+        for _ in range(self.ticker.advance(dt)):
+            if game.alive:
+                game.turn(self.pilot.choose(game))
+                game.step()
+        if self.pilot.stalled(game, laps=2):
+            self.resume()  # not even a lap of the cycle found the food: start a fresh game
+            return
+        if not game.alive:
+            self.dead_for += dt
+            if self.dead_for > self.restart_after:
+                self.resume()
+
+    def draw(self):
+        # The label sits partly on the score area, which present() repaints on every food
+        rects = self.game.present()
+        label = text_cache.render(self.label, font_small, YELLOW).get_rect(topleft=(240, 20))
+        if any(label.colliderect(r) for r in rects):
+            draw_text(screen, self.label, font_small, YELLOW, topleft=label.topleft)
+            rects.append(label)
+        return rects
+
+# Vectorized Snake for agent training: n boards stepped together with the SnakeGame
+# rules (wall and self collision, the tail still blocks the move that would free it,
+# +10 and one segment per food). Each cell stores the tick the head entered it, so a
+# board's body is the cells entered in its last `length` ticks and moving the tail
+# costs nothing. Food comes from a NumPy generator, so boards do not replay like
+# SnakeGame's seeded sessions.
+class VecSnake:
+    """n Snake boards in NumPy arrays. step(actions) takes one DIRS index per board
+    (reversing into the neck is ignored) and returns (obs, rewards, dones), arrays that
+    are reused by the next step; boards that died restart in the same call, leaving
+    their final score in final_score. obs="grid" is int8 (n, rows, cols): 0 empty,
+    1 body, 2 head, 3 food; obs=None skips building it."""
+    DX = np.array([d[0] for d in DIRS])
+    DY = np.array([d[1] for d in DIRS])
+    EMPTY = -(1 << 30)  # entry tick of a cell no snake has visited
+
+    def __init__(self, n, cols=40, rows=25, seed=None, obs="grid"):
+        if obs not in ("grid", None):
+            raise ValueError(f"obs must be 'grid' or None, not {obs!r}")
+        self.n, self.cols, self.rows, self.cells = n, cols, rows, cols * rows
+        self.rng = np.random.default_rng(seed)
+        self.entered = np.empty((n, self.cells), np.int32)
+        self.base = np.arange(n) * self.cells  # board offsets into entered.ravel()
+        self.tick = np.zeros(n, np.int32)
+        self.head = np.zeros(n, np.int64)
+        self.dir = np.zeros(n, np.int64)
+        self.length = np.zeros(n, np.int32)
+        self.food = np.zeros(n, np.int64)
+        self.score = np.zeros(n, np.int64)
+        self.final_score = np.zeros(n, np.int64)
+        self.rewards = np.zeros(n, np.float32)
+        self.dones = np.zeros(n, bool)
+        self.obs = np.zeros((n, rows, cols), np.int8) if obs == "grid" else None
+        self.reset()
+
+    def reset(self):
+        """Restart every board and return the observations."""
+        self.restart(np.arange(self.n))
+        return self.observe()
+
+    def restart(self, idx):
+        self.entered[idx] = self.EMPTY
+        self.tick[idx] = 0
+        self.head[idx] = self.rows // 2 * self.cols + self.cols // 2
+        self.entered.ravel()[self.base[idx] + self.head[idx]] = 0
+        self.dir[idx] = 0
+        self.length[idx] = 1
+        self.score[idx] = 0
+        self.spawn_food(idx)
+
+    def free(self, idx, cells):
+        # Whether each cell is off the body of its board (the tail counts as body)
+        return self.entered.ravel()[self.base[idx] + cells] <= self.tick[idx] - self.length[idx]
+
+    def spawn_food(self, idx):
+        # Uniform over free cells: a few rounds of rejection sampling, then an exact
+        # pick for boards so full that random cells keep missing. A full board gets
+        # no food (-1) and dies on its next move, as in SnakeGame.
+        for _ in range(8):
+            if not idx.size:
+                return
+            cand = self.rng.integers(0, self.cells, idx.size)
+            ok = self.free(idx, cand)
+            self.food[idx[ok]] = cand[ok]
+            idx = idx[~ok]
+        free = self.entered[idx] <= (self.tick[idx] - self.length[idx])[:, None]
+        keys = np.where(free, self.rng.random(free.shape), -1.0)
+        self.food[idx] = np.where(free.any(1), keys.argmax(1), -1)
+
+    def step(self, actions):
+        a = np.asarray(actions, np.int64)
+        self.dir = np.where(a ^ 1 == self.dir, self.dir, a)  # DIRS pairs opposites as i, i ^ 1
+        x = self.head % self.cols + self.DX[self.dir]
+        y = self.head // self.cols + self.DY[self.dir]
+        inside = (x >= 0) & (x < self.cols) & (y >= 0) & (y < self.rows)
+        cell = np.where(inside, y * self.cols + x, 0)
+        alive = inside & self.free(np.arange(self.n), cell)
+
+        self.tick += 1
+        live = np.flatnonzero(alive)
+        self.entered.ravel()[self.base[live] + cell[live]] = self.tick[live]
+        self.head[live] = cell[live]
+        ate = alive & (cell == self.food)
+        self.length += ate
+        self.score += 10 * ate
+        np.multiply(ate, 10, out=self.rewards)
+        self.spawn_food(np.flatnonzero(ate))
+
+        np.logical_not(alive, out=self.dones)
+        done = np.flatnonzero(self.dones)
+        if done.size:
+            self.final_score[done] = self.score[done]
+            self.restart(done)
+        return self.observe(), self.rewards, self.dones
+
+    def observe(self):
+        if self.obs is None:
+            return None
+        flat = self.obs.reshape(self.n, self.cells)
+        np.greater(self.entered, (self.tick - self.length)[:, None], out=flat, casting="unsafe")
+        rows = np.arange(self.n)
+        flat[rows, self.head] = 2
+        fed = self.food >= 0
+        flat[rows[fed], self.food[fed]] = 3
+        return self.obs
+
+# ------------- Tic Tac Toe -------------
+# Classic boards are two 9-bit masks (bit r*3 + c), one per player.
+WIN_MASKS = (0o007, 0o070, 0o700, 0o111, 0o222, 0o444, 0o421, 0o124)
+FULL_BOARD = 0o777
+TTT_TABLE_FILE = "tictactoe3.bin"
+_ttt_table = None
+
+def ttt_won(bits):
+    for m in WIN_MASKS:
+        if bits & m == m:
+            return True
+    return False
+
+def solve_tictactoe():
+    """Perfect-play table: best cell for the side to move in every reachable position,
+    indexed by x_bits << 9 | o_bits (255 where the game is already over)."""
+    table = bytearray([255]) * (1 << 18)
+    memo = {}
+
+    def solve(x, o):
+        # Score for the side to move; faster wins score higher
+        idx = x << 9 | o
+        if idx in memo:
+            return memo[idx]
+        filled = bin(x | o).count("1")
+        x_turn = filled % 2 == 0
+        if ttt_won(o if x_turn else x):
+            best = -(10 - filled)
+        elif x | o == FULL_BOARD:
+            best = 0
+        else:
+            best = None
+            for cell in range(9):
+                bit = 1 << cell
+                if (x | o) & bit:
+                    continue
+                v = -(solve(x | bit, o) if x_turn else solve(x, o | bit))
+                if best is None or v > best:
+                    best = v
+                    table[idx] = cell
+        memo[idx] = best
+        return best
+
+    solve(0, 0)
+    return bytes(table)
+
+def tictactoe_table():
+    """The solved 3x3 table: built once, then cached on disk and in memory."""
+    global _ttt_table
+    if _ttt_table is not None:
+        return _ttt_table
+    path = cache_path(TTT_TABLE_FILE)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) == 1 << 18:
+            _ttt_table = data
+            return data
+    except OSError:
+        pass
+    _ttt_table = solve_tictactoe()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_ttt_table)
+    except OSError:
+        pass  # read-only home: just rebuild next launch
+    return _ttt_table
+
+# m,n,k boards: bit r*cols + c of a Python int per player, any size.
+MNK_PRESETS = ((3, 3, 3), (7, 7, 4), (15, 15, 5))
+MNK_WIN = 1 << 20  # search score for a won position (plus remaining depth)
+_mnk_rules = {}
+
+class SearchTimeout(Exception):
+    pass
+
+class MNKRules:
+    """Geometry of a cols x rows board with k in a row: edge masks for neighbour
+    dilation, every k-cell window for evaluation, and Zobrist keys for hashing."""
+    def __init__(self, cols, rows, k):
+        self.cols, self.rows, self.k = cols, rows, k
+        self.cells = cols * rows
+        self.full = (1 << self.cells) - 1
+        col0 = sum(1 << (r * cols) for r in range(rows))
+        self.not_first_col = self.full & ~col0
+        self.not_last_col = self.full & ~(col0 << (cols - 1))
+        self.windows = []
+        for r in range(rows):
+            for c in range(cols):
+                for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                    er, ec = r + dy * (k - 1), c + dx * (k - 1)
+                    if 0 <= er < rows and 0 <= ec < cols:
+                        self.windows.append(sum(1 << ((r + dy * i) * cols + c + dx * i) for i in range(k)))
+        self.weights = [0] + [4 ** n for n in range(1, k + 1)]
+        rng = random.Random(cols * 10007 + rows * 101 + k)
+        self.zobrist = [[rng.getrandbits(64) for _ in range(self.cells)] for _ in range(2)]
+        self.side_key = rng.getrandbits(64)
+        self.tt = {}  # Zobrist hash -> (depth, value, flag, best cell); lives in the search worker
+        # Centre-first order for ties in move ordering
+        mid_r, mid_c = (rows - 1) / 2, (cols - 1) / 2
+        self.by_centre = sorted(range(self.cells), key=lambda i: abs(i // cols - mid_r) + abs(i % cols - mid_c))
+
+    def wins_at(self, bits, cell):
+        # Incremental win check: only the four lines through the last move
+        r, c = divmod(cell, self.cols)
+        for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            run = 1
+            for sgn in (1, -1):
+                x, y = c + dx * sgn, r + dy * sgn
+                while 0 <= x < self.cols and 0 <= y < self.rows and bits >> (y * self.cols + x) & 1:
+                    run += 1
+                    x += dx * sgn
+                    y += dy * sgn
+            if run >= self.k:
+                return True
+        return False
+
+    def near(self, stones):
+        # Cells within one step (8-neighbourhood) of any stone, by shifting the bitboard
+        cols = self.cols
+        side = ((stones << 1) & self.not_first_col) | ((stones >> 1) & self.not_last_col) | stones
+        return (side | (side << cols) | (side >> cols)) & self.full
+
+    def moves(self, me, opp, first=None):
+        taken = me | opp
+        if not taken:
+            return [self.by_centre[0]]
+        free = self.near(taken) & ~taken
+        order = [i for i in self.by_centre if free >> i & 1]
+        if first is not None and free >> first & 1:
+            order.remove(first)
+            order.insert(0, first)
+        return order
+
+    def evaluate(self, me, opp):
+        # Open windows only: k-cell lines still winnable by one side
+        score = 0
+        weights = self.weights
+        for w in self.windows:
+            m, o = w & me, w & opp
+            if m and not o:
+                score += weights[m.bit_count()]
+            elif o and not m:
+                score -= weights[o.bit_count()]
+        return score
+
+    def hash(self, me, opp, side):
+        h = self.side_key if side else 0
+        for i in range(self.cells):
+            if me >> i & 1:
+                h ^= self.zobrist[side][i]
+            elif opp >> i & 1:
+                h ^= self.zobrist[1 - side][i]
+        return h
+
+def mnk_rules(cols, rows, k):
+    key = (cols, rows, k)
+    if key not in _mnk_rules:
+        _mnk_rules[key] = MNKRules(cols, rows, k)
+    return _mnk_rules[key]
+
+def mnk_search(cols, rows, k, me, opp, side, budget):
+    """Best cell for the side to move (`me`, colour `side`) by iterative-deepening
+    alpha-beta with a Zobrist transposition table, stopping after `budget` seconds."""
+    rules = mnk_rules(cols, rows, k)
+    deadline = time.perf_counter() + budget
+    zob, side_key = rules.zobrist, rules.side_key
+    tt = rules.tt
+    if len(tt) > 1_000_000:
+        tt.clear()
+    nodes = [0]
+
+    def negamax(me, opp, side, h, depth, alpha, beta):
+        nodes[0] += 1
+        if nodes[0] & 1023 == 0 and time.perf_counter() > deadline:
+            raise SearchTimeout
+        entry = tt.get(h)
+        first = None
+        if entry is not None:
+            d, v, flag, first = entry
+            if d >= depth:
+                if flag == 0:
+                    return v
+                if flag > 0:
+                    alpha = max(alpha, v)
+                else:
+                    beta = min(beta, v)
+                if alpha >= beta:
+                    return v
+        if depth == 0:
+            return rules.evaluate(me, opp)
+        moves = rules.moves(me, opp, first)
+        if not moves or (me | opp) == rules.full:
+            return 0
+        alpha0, best, best_move = alpha, -MNK_WIN * 2, moves[0]
+        for c in moves:
+            bit = 1 << c
+            if rules.wins_at(me | bit, c):
+                v = MNK_WIN + depth  # sooner wins score higher
+            else:
+                v = -negamax(opp, me | bit, 1 - side, h ^ zob[side][c] ^ side_key, depth - 1, -beta, -alpha)
+            if v > best:
+                best, best_move = v, c
+            if v > alpha:
+                alpha = v
+            if alpha >= beta:
+                break
+        flag = -1 if best <= alpha0 else (1 if best >= beta else 0)
+        tt[h] = (depth, best, flag, best_move)
+        return best
+
+    root = rules.hash(me, opp, side)
+    moves = rules.moves(me, opp)
+    best = moves[0]
+    empty = rules.cells - (me | opp).bit_count()
+    try:
+        for depth in range(1, empty + 1):
+            negamax(me, opp, side, root, depth, -MNK_WIN * 2, MNK_WIN * 2)
+            best = tt[root][3]
+            if abs(tt[root][1]) >= MNK_WIN:
+                break  # forced result found
+    except SearchTimeout:
+        pass  # keep the last fully searched depth
+    return best
+
+_ai_pool = None
+
+def ai_pool():
+    # One long-lived worker process: the search never shares the GIL with the frame loop,
+    # and its transposition table carries over between moves
+    global _ai_pool
+    if _ai_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _ai_pool = ProcessPoolExecutor(max_workers=1)
+    return _ai_pool
+
+_mark_fonts = {}
+
+def mark_font(px):
+    if px not in _mark_fonts:
+        _mark_fonts[px] = sys_font("arial", px, bold=True)
+    return _mark_fonts[px]
 
-# ------------- Tic Tac Toe -------------        
 class TicTacToe:
-    def __init__(self):
+    think_time = 0.5  # seconds per computer move on boards without a solved table
+    hint = "B: Board  •  C: vs CPU  •  R: Restart  •  M: Menu"
+
+    def __init__(self, cols=3, rows=3, k=3, ai=None):
+        self.cols, self.rows, self.k = cols, rows, k
+        self.rules = mnk_rules(cols, rows, k)
+        self.solved = (cols, rows, k) == (3, 3, 3)
+        self.ai = ai  # "O"/"X" for a computer player, None for local 2P
+        self.pending = None  # future of an in-flight search
+        self.background = LayerCache(self.render_background)
         self.reset()
 
     def reset(self):
-        self.board = [["" for _ in range(3)] for _ in range(3)]
+        self.bits = {"X": 0, "O": 0}
         self.turn = "X"
         self.winner = None
         self.moves = 0
+        self.pending = None  # a stale search result is dropped
+        self.redraw = True  # renderer: full repaint pending
+        self.dirty = []     # renderer: squares played since the last present
+        self.ai_move()
+
+    def mark(self, r, c):
+        bit = 1 << (r * self.cols + c)
+        if self.bits["X"] & bit: return "X"
+        if self.bits["O"] & bit: return "O"
+        return ""
+
+    def handle_mouse(self, pos, size):
+        w, h = size
+        cell_w = w // self.cols
+        cell_h = (h - HUD_H) // self.rows
+        if pos[1] < HUD_H:  # ignore HUD area
+            return
+        c = clamp(pos[0] // cell_w, 0, self.cols - 1)
+        r = clamp((pos[1] - HUD_H) // cell_h, 0, self.rows - 1)
+        if self.turn != self.ai and self.play(r, c):
+            self.ai_move()
+
+    def set_ai(self, side):
+        self.ai = side
+        self.pending = None
+        self.redraw = True
+        self.ai_move()
+
+    def ai_move(self):
+        if self.winner or self.turn != self.ai or self.pending is not None:
+            return
+        if self.solved:
+            # O(1): one lookup in the solved table
+            cell = tictactoe_table()[self.bits["X"] << 9 | self.bits["O"]]
+            self.play(cell // 3, cell % 3)
+            return
+        me, opp = self.bits[self.turn], self.bits["O" if self.turn == "X" else "X"]
+        side = 0 if self.turn == "X" else 1
+        self.pending = ai_pool().submit(mnk_search, self.cols, self.rows, self.k, me, opp, side, self.think_time)
+
+    def update(self):
+        # Called every frame: apply the worker's move once it is ready
+        if self.pending is not None and self.pending.done():
+            cell = self.pending.result()
+            self.pending = None
+            self.play(cell // self.cols, cell % self.cols)
+
+    def play(self, r, c):
+        if self.winner: return False
+        cell = r * self.cols + c
+        bit = 1 << cell
+        if (self.bits["X"] | self.bits["O"]) & bit:
+            return False
+        self.bits[self.turn] |= bit
+        self.moves += 1
+        self.dirty.append((r, c))
+        if self.check_win(cell):
+            self.winner = self.turn
+        elif self.moves == self.rules.cells:
+            self.winner = "Draw"
+        else:
+            self.turn = "O" if self.turn == "X" else "X"
+        return True
 
-    def handle_mouse(self, pos):
-        if self.winner: return
-        w, h = screen.get_width(), screen.get_height()
-        cell_w = w // 3
-        cell_h = (h - 60) // 3
-        if pos[1] < 60:  # ignore HUD area
-            return
-        c = clamp(pos[0] // cell_w, 0, 2)
-        r = clamp((pos[1] - 60) // cell_h, 0, 2)
-        if self.board[r][c] == "":
-            self.board[r][c] = self.turn
-            self.moves += 1
-            if self.check_win():
-                self.winner = self.turn
-            elif self.moves == 9:
-                self.winner = "Draw"
-            else:
-                self.turn = "O" if self.turn == "X" else "X"
-
-    def check_win(self):
-        b = self.board
-        lines = []
-        for i in range(3):
-            lines.append(b[i])
-            lines.append([b[0][i], b[1][i], b[2][i]])
-        lines.append([b[0][0], b[1][1], b[2][2]])
-        lines.append([b[0][2], b[1][1], b[2][0]])
-        for line in lines:
-            if line[0] != "" and line[0] == line[1] == line[2]:
-                return True
-        return False
+    def check_win(self, cell):
+        return self.rules.wins_at(self.bits[self.turn], cell)
 
-    def draw(self):
-        w, h = screen.get_width(), screen.get_height()
+    def render_background(self, size):
+        w, h = size
+        bg = pygame.Surface(size).convert()
         # HUD
-        pygame.draw.rect(screen, DEEP, (0, 0, w, 60))
-        pygame.draw.line(screen, (70, 80, 100), (0, 60), (w, 60), 2)
-        status = f"Turn: {self.turn}" if not self.winner else (f"Winner: {self.winner}" if self.winner != "Draw" else "Draw!")
-        draw_text(screen, status, font_med, UI, topleft=(16, 16))
-        draw_text(screen, "Click to play  •  R: Restart  •  M: Menu", font_small, UI, topleft=(w - 320, 20))
+        pygame.draw.rect(bg, DEEP, (0, 0, w, 60))
+        pygame.draw.line(bg, (70, 80, 100), (0, 60), (w, 60), 2)
+        help_text = f"{self.cols}x{self.rows}, {self.k} in a row  •  {self.hint}"
+        draw_text(bg, help_text, font_small, UI, topleft=(w - 640, 20))
 
         # Board
-        cell_w = w // 3
-        cell_h = (h - 60) // 3
+        cell_w = w // self.cols
+        cell_h = (h - 60) // self.rows
+        line_w = 6 if self.cols <= 3 else 2
 
-        screen.fill((240, 242, 247), rect=pygame.Rect(0, 60, w, h - 60))
+        bg.fill((240, 242, 247), rect=pygame.Rect(0, 60, w, h - 60))
 
         # Grid lines
-        for i in range(1, 3):
-            pygame.draw.line(screen, BLACK, (i * cell_w, 60), (i * cell_w, h), 6)
-            pygame.draw.line(screen, BLACK, (0, 60 + i * cell_h), (w, 60 + i * cell_h), 6)
+        for i in range(1, self.cols):
+            pygame.draw.line(bg, BLACK, (i * cell_w, 60), (i * cell_w, h), line_w)
+        for i in range(1, self.rows):
+            pygame.draw.line(bg, BLACK, (0, 60 + i * cell_h), (w, 60 + i * cell_h), line_w)
+        return bg
+
+    def status(self):
+        if self.pending is not None:
+            return "CPU thinking..."
+        text = f"Turn: {self.turn}" if not self.winner else (f"Winner: {self.winner}" if self.winner != "Draw" else "Draw!")
+        return text + ("  (vs CPU)" if self.ai else "")
+
+    def square_rect(self, r, c):
+        w, h = screen.get_width(), screen.get_height()
+        cell_w = w // self.cols
+        cell_h = (h - 60) // self.rows
+        return pygame.Rect(c * cell_w, 60 + r * cell_h, cell_w, cell_h)
+
+    def draw_mark(self, r, c):
+        mark = self.mark(r, c)
+        if mark != "":
+            color = BLUE if mark == "X" else ACCENT2
+            rect = self.square_rect(r, c)
+            font = font_title if self.solved else mark_font(max(8, int(min(rect.w, rect.h) * 0.7)))
+            draw_text(screen, mark, font, color, center=rect.center)
+
+    def draw(self):
+        screen.blit(self.background.get(screen.get_size()), (0, 0))
+        draw_text(screen, self.status(), font_med, UI, topleft=(16, 16))
 
         # Marks
-        for r in range(3):
-            for c in range(3):
-                mark = self.board[r][c]
-                if mark != "":
-                    cx = c * cell_w + cell_w // 2
-                    cy = 60 + r * cell_h + cell_h // 2
-                    color = BLUE if mark == "X" else ACCENT2
-                    draw_text(screen, mark, font_title, color, center=(cx, cy))
-
-def run_tictactoe():
-    game = TicTacToe()
-    while True:
-        dt = clock.tick(60) / 1000.0
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+        for r in range(self.rows):
+            for c in range(self.cols):
+                self.draw_mark(r, c)
+
+    def present(self):
+        """Bring the screen up to date and return the rects that changed ([] when nothing did)."""
+        if self.redraw or self.background.size != screen.get_size():
+            self.draw()
+            self.redraw = False
+            self.dirty.clear()
+            self.drawn_status = self.status()
+            return [screen.get_rect()]
+        bg = self.background.surf
+        rects = []
+        for r, c in self.dirty:
+            rects.append(restore(screen, bg, self.square_rect(r, c)))
+            self.draw_mark(r, c)
+        self.dirty.clear()
+        if self.status() != self.drawn_status:
+            rects.append(restore(screen, bg, HUD_STATUS))
+            draw_text(screen, self.status(), font_med, UI, topleft=(16, 16))
+            self.drawn_status = self.status()
+        return rects
+
+class TicTacToeScene(Scene):
+    def preload(self):
+        tictactoe_table()  # load the solved table up front, never in the click path
+        self.preset = 0
+        self.game = TicTacToe()
+
+    def invalidate(self):
+        self.game.redraw = True
+
+    def idle_timeout(self):
+        return None if self.game.pending is not None else math.inf  # poll only while the CPU thinks
+
+    def update(self, dt, events):
+        game = self.game
+        for e in events:
             if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_F11: toggle_fullscreen()
-                elif e.key == pygame.K_m: return
+                if e.key == pygame.K_m:
+                    self.director.switch("menu")
+                    return
                 elif e.key == pygame.K_r: game.reset()
+                elif e.key == pygame.K_c: game.set_ai(None if game.ai else "O")
+                elif e.key == pygame.K_b:
+                    self.preset = (self.preset + 1) % len(MNK_PRESETS)
+                    self.game = game = TicTacToe(*MNK_PRESETS[self.preset], ai=game.ai)
             if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
-                game.handle_mouse(pygame.mouse.get_pos())
+                game.handle_mouse(e.pos, screen.get_size())
+        game.update()
 
-        screen.fill(BLACK)
-        game.draw()
-        pygame.display.flip()
+    def draw(self):
+        profiler.count("moves", self.game.moves)
+        return self.game.present()
+
+# ------------- Replays -------------
+# A session log is a header (game, seed, starting size) followed by one byte per
+# sim tick: the inputs that tick consumed. Replaying the bytes against a sim built
+# from the same seed reproduces the session exactly.
+#   Atari byte: bit0 left, bit1 right, bit2 fire
+#   Snake byte: bits0-1 direction (index into DIRS), bits2-5 "1" presses (max 15)
+#   both:       bit6 restart before this tick, bit7 resize (uint16 w, h follow)
+LOG_GAMES = ("atari", "snake")
+LOG_RESTART = 0x40
+LOG_RESIZE = 0x80
+
+class InputLog:
+    """Writes one session's compact input log; all methods are no-ops if the file can't be opened.
+    Ticks are buffered and synced to disk every flush_every seconds, so a crash, kill or
+    power cut loses at most that much of the session."""
+    flush_every = 2.0
+    MAGIC = b"ARC2"  # ARC1 logs stepped Atari at 1/120 s and no longer replay
+    HEADER = struct.Struct("<4sBQHH")  # magic, game, seed, w, h
+    RESIZE = struct.Struct("<HH")
+
+    def __init__(self, path, game, seed, size):
+        self.path = path
+        self.buf = bytearray()
+        self.pending = 0
+        self.size = None
+        self.flushed = time.perf_counter()
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.f = open(path, "wb")
+            self.f.write(self.HEADER.pack(self.MAGIC, LOG_GAMES.index(game), seed, *size))
+            self.f.flush()
+        except OSError:
+            self.f = None
+
+    @classmethod
+    def session(cls, game, seed, size):
+        name = f"{game}-{time.strftime('%Y%m%d-%H%M%S')}-{seed}.arcr"
+        return cls(cache_path(os.path.join("replays", name)), game, seed, size)
+
+    def restart(self):
+        self.pending |= LOG_RESTART
+
+    def resize(self, w, h):
+        self.size = (w, h)
+
+    def tick(self, bits):
+        if self.f is None:
+            return
+        bits |= self.pending
+        self.pending = 0
+        if self.size is not None:
+            self.buf.append(bits | LOG_RESIZE)
+            self.buf += self.RESIZE.pack(*self.size)
+            self.size = None
+        else:
+            self.buf.append(bits)
+        if time.perf_counter() - self.flushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.flushed = time.perf_counter()
+        if self.f is not None and self.buf:
+            try:
+                self.f.write(self.buf)
+                self.f.flush()
+                os.fsync(self.f.fileno())
+            except OSError:
+                pass  # disk full or gone: keep playing, the log just ends here
+            self.buf.clear()
+
+    def close(self):
+        if self.f is not None:
+            self.flush()
+            self.f.close()
+            self.f = None
+
+class ReplayLog:
+    """Reads an InputLog through mmap, so long logs are paged in as they're replayed."""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            # Empty or cut off inside the header (mmap refuses empty files)
+            if os.fstat(f.fileno()).st_size < InputLog.HEADER.size:
+                raise ValueError(f"{path}: not an arcade replay log")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, game, self.seed, w, h = InputLog.HEADER.unpack_from(self.mm, 0)
+        if magic != InputLog.MAGIC or game >= len(LOG_GAMES):
+            self.mm.close()
+            raise ValueError(f"{path}: not an arcade replay log")
+        self.game = LOG_GAMES[game]
+        self.size = (w, h)
+
+    def __iter__(self):
+        # (input byte, new size or None) per tick
+        mm, pos, end = self.mm, InputLog.HEADER.size, len(self.mm)
+        unpack = InputLog.RESIZE.unpack_from
+        while pos < end:
+            bits = mm[pos]
+            pos += 1
+            size = None
+            if bits & LOG_RESIZE:
+                if pos + InputLog.RESIZE.size > end:
+                    return  # cut off mid-tick by a crash
+                size = unpack(mm, pos)
+                pos += InputLog.RESIZE.size
+            yield bits, size
+
+    def new_sim(self):
+        cls = AtariSim if self.game == "atari" else SnakeGame
+        return cls(*self.size, seed=self.seed)
+
+    def close(self):
+        self.mm.close()
+
+def atari_bits(move, fire):
+    return (move < 0) | (move > 0) << 1 | bool(fire) << 2
+
+def snake_bits(game, presses):
+    return DIRS.index(game.dir) | min(presses, 15) << 2
+
+def replay_tick(sim, bits, size):
+    """Apply one logged tick to an AtariSim or SnakeGame, exactly as the live loop did."""
+    if size is not None:
+        sim.resize(*size)
+    if bits & LOG_RESTART:
+        sim.reset()
+    if isinstance(sim, AtariSim):
+        sim.step(sim.dt, (bits >> 1 & 1) - (bits & 1), bool(bits & 4))
+    else:
+        sim.grow += bits >> 2 & 15
+        sim.dir = DIRS[bits & 3]
+        sim.step()
+
+def replay_turbo(path):
+    """Replay a log with no display and no frame cap; returns the final stats."""
+    log = ReplayLog(path)
+    sim = log.new_sim()
+    t0 = time.perf_counter()
+    ticks = 0
+    for bits, size in log:
+        replay_tick(sim, bits, size)
+        ticks += 1
+    secs = time.perf_counter() - t0
+    log.close()
+    return {"game": log.game, "seed": log.seed, "ticks": ticks, "score": sim.score,
+            "steps_per_s": round(ticks / secs) if secs else None}
+
+class ReplayScene(Scene):
+    """Plays a log back at normal speed. M/Esc stops."""
+    def __init__(self, path):
+        self.path = path
+
+    def preload(self):
+        self.log = ReplayLog(self.path)
+        self.sim = self.log.new_sim()
+        self.star = Starfield(200, screen.get_size())
+        self.ticker = FixedStep(self.sim.dt if self.log.game == "atari" else SnakeGame.step_interval)
+        self.ticks = iter(self.log)
+
+    def exit(self):
+        self.log.close()
+
+    def invalidate(self):
+        self.sim.redraw = True
+
+    def update(self, dt, events):
+        for e in events:
+            if e.type == pygame.KEYDOWN and e.key in (pygame.K_m, pygame.K_ESCAPE):
+                self.director.quit()
+                return
+        for _ in range(self.ticker.advance(dt)):
+            tick = next(self.ticks, None)
+            if tick is None:
+                self.director.quit()
+                return
+            replay_tick(self.sim, *tick)
+        if self.log.game == "atari":
+            self.star.update(dt, 1.0)
 
-# ------------- Main -------------
-def main():
-    state = "menu"
-    starfield = Starfield(220)
-    t = 0.0
+    def draw(self):
+        if self.log.game == "atari":
+            draw_atari(self.sim, self.star, self.ticker.alpha * self.sim.dt)
+            return None
+        return self.sim.present()
+
+def replay_realtime(path):
+    """Play a log back in a window at normal speed; returns the final score."""
+    init_display()
+    scene = ReplayScene(path)
+    Director({"replay": scene}, "replay").run()
+    return scene.sim.score
+
+def replay_main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="gamelibs.py replay", description="Play back a recorded session.")
+    ap.add_argument("log", help="a .arcr file (sessions are saved under the arcade cache's replays/)")
+    ap.add_argument("--turbo", action="store_true", help="no window, uncapped: print the final stats")
+    args = ap.parse_args(argv)
+    try:
+        ReplayLog(args.log).close()
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    if args.turbo:
+        print(json.dumps(replay_turbo(args.log), indent=2))
+    else:
+        print(json.dumps({"score": replay_realtime(args.log)}))
+
+# ------------- Batch runner -------------
+# Headless games for soak tests and tournaments: `python gamelibs.py batch --help`.
+# An input policy is called once per sim step with (game, rng): Atari policies
+# return (move, fire), Snake policies return a direction or None to keep going.
+def atari_random(sim, rng):
+    return rng.choice((-1, 0, 1)), rng.random() < 0.5
+
+def atari_scripted(sim, rng):
+    # Sweep back and forth across the screen, always firing
+    return (1 if int(sim.t / 1.5) % 2 == 0 else -1), True
+
+def atari_heuristic(sim, rng):
+    # Chase the lowest enemy in front of us, always firing
+    en = sim.enemies
+    if not en.n:
+        return 0, True
+    i = int(np.argmax(en.y[:en.n]))
+    dx = en.x[i] - sim.player.x
+    return (0 if abs(dx) < 8 else (1 if dx > 0 else -1)), True
+
+def snake_random(game, rng):
+    return rng.choice(DIRS) if rng.random() < 0.1 else None
+
+def snake_scripted(game, rng):
+    # Follow a fixed Hamiltonian cycle of the board
+    return cycle_dir(*game.snake[0], *game.grid_size())
+
+def snake_heuristic(game, rng):
+    # Greedy toward the food over the moves that don't die next step
+    cols, rows = game.grid_size()
+    hx, hy = game.snake[0]
+    best, best_dist = None, None
+    for d in DIRS:
+        if d == (-game.dir[0], -game.dir[1]):
+            continue
+        nx, ny = hx + d[0], hy + d[1]
+        if not (0 <= nx < cols and 0 <= ny < rows) or not game.free.is_free(game.free.id(nx, ny)):
+            continue
+        fx, fy = game.food if game.food is not None else (nx, ny)
+        dist = abs(fx - nx) + abs(fy - ny)
+        if best is None or dist < best_dist:
+            best, best_dist = d, dist
+    return best
+
+snake_pilot = SnakePilot(budget=None)  # unbounded, so a seed replays the same game on any machine
+
+def snake_autopilot(game, rng):
+    return snake_pilot.choose(game)
+
+POLICIES = {
+    "atari": {"random": atari_random, "scripted": atari_scripted, "heuristic": atari_heuristic},
+    "snake": {"random": snake_random, "scripted": snake_scripted, "heuristic": snake_heuristic,
+              "autopilot": snake_autopilot},
+}
+
+def play_headless(game, policy, seed, max_ticks, size=DEFAULT_SIZE):
+    """Play one headless game to its end (or max_ticks) and return its stats."""
+    rng = random.Random(seed ^ 0x5EED)  # the policy's own stream, apart from the game's
+    pick = POLICIES[game][policy]
+    if game == "atari":
+        sim = AtariSim(*size, seed=seed)
+        step = lambda dt: sim.step(dt, *pick(sim, rng))
+        done = lambda: sim.game_over
+        dt = AtariSim.dt
+    else:
+        sim = SnakeGame(*size, seed=seed)
+
+        def step(dt):
+            d = pick(sim, rng)
+            if d is not None:
+                sim.turn(d)
+            sim.step()
+        done = lambda: not sim.alive
+        dt = SnakeGame.step_interval
+    ticks, secs = run_turbo(step, dt, max_ticks, done)
+    return {
+        "game": game, "policy": policy, "seed": seed, "score": sim.score,
+        "ticks": ticks, "game_seconds": round(ticks * dt, 3),
+        "finished": done(), "steps_per_s": round(ticks / secs) if secs else None,
+    }
+
+def _play_job(job):
+    return play_headless(*job)
+
+def run_batch(game, games, policy="random", seed=0, workers=None, max_ticks=100000, size=DEFAULT_SIZE):
+    """Run `games` headless games across a process pool and return a summary report.
+    Game i is seeded with seed + i, so a whole batch is reproducible."""
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = [(game, policy, seed + i, max_ticks, size) for i in range(games)]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_play_job, jobs, chunksize=max(1, games // (4 * (workers or os.cpu_count() or 1)))))
+    wall = time.perf_counter() - t0
+    scores = sorted(r["score"] for r in results)
+    lengths = [r["ticks"] for r in results]
+    steps = sum(lengths)
+    return {
+        "game": game, "policy": policy, "games": games, "seed": seed,
+        "workers": workers or os.cpu_count(), "wall_seconds": round(wall, 3),
+        "total_steps": steps, "steps_per_s": round(steps / wall) if wall else None,
+        "score": {"mean": sum(scores) / games, "min": scores[0], "median": scores[games // 2], "max": scores[-1]},
+        "length": {"mean": steps / games, "min": min(lengths), "max": max(lengths)},
+        "unfinished": sum(not r["finished"] for r in results),
+        "results": results,
+    }
+
+def batch_main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="gamelibs.py batch", description="Run headless games in parallel.")
+    ap.add_argument("--game", choices=sorted(POLICIES), default="snake")
+    ap.add_argument("--policy", choices=sorted({p for game in POLICIES.values() for p in game}), default="random")
+    ap.add_argument("--games", type=int, default=100)
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--seed", type=int, default=0, help="game i uses seed + i")
+    ap.add_argument("--max-ticks", type=int, default=100000, help="cap on sim steps per game")
+    ap.add_argument("--size", type=int, nargs=2, default=DEFAULT_SIZE, metavar=("W", "H"))
+    ap.add_argument("--json", metavar="PATH", help="write the full report (with per-game results) here")
+    args = ap.parse_args(argv)
+    if args.policy not in POLICIES[args.game]:
+        ap.error(f"no {args.policy!r} policy for {args.game}")
+
+    report = run_batch(args.game, args.games, args.policy, args.seed, args.workers, args.max_ticks, tuple(args.size))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    summary = {k: v for k, v in report.items() if k != "results"}
+    print(json.dumps(summary, indent=2))
+
+# ------------- Netplay -------------
+# `python gamelibs.py serve` runs the match server; N / O on the menu join it.
+# Line-delimited JSON over TCP, one object per message, "t" = message type:
+#   client -> server: hello {game}, ping {ts}, move {cell}, again, dir {d}
+#   server -> client: pong {ts}, wait, start {...}, move {cell}, tick {...}, over {winner}, left
+# Tic Tac Toe moves are checked and relayed. Snake runs on the server, which sends a
+# snapshot at round start and then one delta per tick: each snake's new head and
+# whether its tail moved ("m"), plus deaths ("d") and food ("f") only when they change.
+NET_ADDR = ("127.0.0.1", 7777)
+NET_SNAKE_GRID = (40, 25)  # fixed, so both players share a board whatever their window size
+
+def net_addr(text=None):
+    # "host:port", else $ARCADE_SERVER, else localhost
+    text = text or os.environ.get("ARCADE_SERVER")
+    if not text:
+        return NET_ADDR
+    host, _, port = text.rpartition(":")
+    return host or NET_ADDR[0], int(port)
+
+def net_encode(msg):
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+class NetPeer:
+    """Server side of one connection. Writes never wait: a client that stops reading is
+    dropped once its backlog passes max_buffer, instead of stalling everyone else."""
+    max_buffer = 1 << 20
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.seat = 0
+
+    def send_raw(self, data):
+        if self.writer.is_closing():
+            return
+        self.writer.write(data)
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.writer.close()
+
+    def send(self, msg):
+        self.send_raw(net_encode(msg))
+
+class NetMatch:
+    closed = False
+
+    def __init__(self, peers):
+        self.peers = peers
+        for seat, peer in enumerate(peers):
+            peer.match, peer.seat = self, seat
+
+    def broadcast(self, msg):
+        data = net_encode(msg)  # encoded once for every player
+        for peer in self.peers:
+            peer.send_raw(data)
+
+    def leave(self, peer):
+        self.closed = True
+        for other in self.peers:
+            other.match = None
+            if other is not peer:
+                other.send({"t": "left"})
+
+class TicTacToeMatch(NetMatch):
+    """Classic 3x3; seat 0 plays X. Moves are validated here and relayed to the opponent."""
+    def __init__(self, peers):
+        super().__init__(peers)
+        self.rules = mnk_rules(3, 3, 3)
+        self.reset()
+
+    def reset(self):
+        self.bits = [0, 0]
+        self.turn = 0
+        self.over = False
+        for peer in self.peers:
+            peer.send({"t": "start", "game": "tictactoe", "you": "XO"[peer.seat]})
+
+    def on_message(self, peer, msg):
+        t = msg.get("t")
+        if t == "again" and self.over:
+            self.reset()
+        if t != "move" or self.over or peer.seat != self.turn:
+            return
+        cell = msg.get("cell")
+        if type(cell) is not int or not 0 <= cell < 9 or (self.bits[0] | self.bits[1]) >> cell & 1:
+            return
+        self.bits[self.turn] |= 1 << cell
+        self.over = self.rules.wins_at(self.bits[self.turn], cell) or self.bits[0] | self.bits[1] == FULL_BOARD
+        self.turn ^= 1
+        self.peers[self.turn].send({"t": "move", "cell": cell})
+
+class SnakeMatch(NetMatch):
+    """Server-authoritative Snake for several players on one board, stepped by the server's
+    tick loop. Heads colliding with anything (walls, bodies, each other) die; the last
+    snake standing wins and a new round starts restart_delay seconds later."""
+    restart_delay = 3.0
+
+    def __init__(self, peers, seed):
+        super().__init__(peers)
+        self.cols, self.rows = NET_SNAKE_GRID
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        cols, rows = self.cols, self.rows
+        n = len(self.peers)
+        self.free = FreeCells(cols, rows)
+        self.snakes, self.dirs = [], []
+        for i in range(n):
+            # Alternate sides, facing each other
+            x = cols // 4 if i % 2 == 0 else cols - 1 - cols // 4
+            y = rows * (i + 1) // (n + 1)
+            self.snakes.append(deque([(x, y)]))
+            self.free.take(self.free.id(x, y))
+            self.dirs.append(DIRS[i % 2])
+        self.want = list(self.dirs)
+        self.grow = [2] * n
+        self.alive = [True] * n
+        self.food = self.free.choice(self.rng)
+        self.tick = 0
+        self.over_at = None
+        snap = {"t": "start", "game": "snake", "cols": cols, "rows": rows, "interval": SnakeGame.step_interval,
+                "snakes": [list(s) for s in self.snakes], "dirs": [DIRS.index(d) for d in self.dirs], "food": self.food}
+        for peer in self.peers:
+            peer.send(dict(snap, you=peer.seat))
+
+    def on_message(self, peer, msg):
+        d = msg.get("d")
+        if msg.get("t") == "dir" and type(d) is int and 0 <= d < 4:
+            self.want[peer.seat] = DIRS[d]
+
+    def step(self, now):
+        if self.over_at is not None:
+            if now - self.over_at >= self.restart_delay:
+                self.reset()
+            return
+        self.tick += 1
+        free, moves, dead = self.free, [None] * len(self.snakes), []
+        heads = []
+        for i, snake in enumerate(self.snakes):
+            if not self.alive[i]:
+                heads.append(None)
+                continue
+            d = self.want[i]
+            if d == (-self.dirs[i][0], -self.dirs[i][1]):
+                d = self.dirs[i]  # no reversing into the neck
+            self.dirs[i] = d
+            heads.append((snake[0][0] + d[0], snake[0][1] + d[1]))
+        # Tails move out before heads move in, so chasing a tail is safe
+        for i, head in enumerate(heads):
+            if head is None:
+                continue
+            if head == self.food or self.grow[i] > 0:
+                self.grow[i] = max(0, self.grow[i] - (head != self.food))
+                moves[i] = [head[0], head[1], 0]
+            else:
+                tx, ty = self.snakes[i].pop()
+                free.release(free.id(tx, ty))
+                moves[i] = [head[0], head[1], 1]
+        ate = False
+        for i, head in enumerate(heads):
+            if head is None:
+                continue
+            x, y = head
+            if not (0 <= x < self.cols and 0 <= y < self.rows) or heads.count(head) > 1 or not free.is_free(free.id(x, y)):
+                dead.append(i)
+                continue
+            free.take(free.id(x, y))
+            self.snakes[i].appendleft(head)
+            ate |= head == self.food
+        for i in dead:
+            self.alive[i] = False
+            moves[i] = None
+            for x, y in self.snakes[i]:
+                free.release(free.id(x, y))
+            self.snakes[i].clear()
+        delta = {"t": "tick", "n": self.tick, "m": moves}
+        if dead:
+            delta["d"] = dead
+        if ate:
+            self.food = free.choice(self.rng) if len(free) else None
+            delta["f"] = self.food
+        self.broadcast(delta)
+        if sum(self.alive) <= 1:
+            alive = [i for i, a in enumerate(self.alive) if a]
+            self.broadcast({"t": "over", "winner": alive[0] if alive else None})
+            self.over_at = now
+
+class ArcadeServer:
+    """Matchmaking and match hosting for netplay; pairs clients per game in arrival order.
+    Every Snake match is stepped from one tick loop, and the loop's own timing is kept
+    so a load test can tell when the server stops keeping up."""
+    players = 2
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.waiting = {"tictactoe": [], "snake": []}
+        self.snake_matches = []
+        self.peers = 0
+        self.matches = 0
+        self.tick_work = deque(maxlen=1000)  # seconds spent per tick-loop pass
+        self.late = 0                        # passes that started over half an interval late
+
+    async def handle(self, reader, writer):
+        peer = NetPeer(writer)
+        self.peers += 1
+        try:
+            async for line in reader:
+                msg = json.loads(line)
+                t = msg.get("t")
+                if t == "ping":
+                    peer.send({"t": "pong", "ts": msg.get("ts")})
+                elif t == "hello":
+                    self.join(peer, msg.get("game"))
+                elif t == "stats":
+                    peer.send(dict(self.stats(), t="stats"))
+                elif peer.match is not None:
+                    peer.match.on_message(peer, msg)
+        except (OSError, ValueError, AttributeError):
+            pass  # dropped connection, or a line that isn't a JSON object
+        finally:
+            self.peers -= 1
+            self.leave(peer)
+            writer.close()
+
+    def join(self, peer, game):
+        queue = self.waiting.get(game)
+        if queue is None or peer in queue or peer.match is not None:
+            return
+        queue.append(peer)
+        if len(queue) < self.players:
+            peer.send({"t": "wait"})
+            return
+        peers = queue[:self.players]
+        del queue[:self.players]
+        self.matches += 1
+        if game == "tictactoe":
+            TicTacToeMatch(peers)
+        else:
+            self.snake_matches.append(SnakeMatch(peers, self.rng.getrandbits(63)))
+
+    def leave(self, peer):
+        for queue in self.waiting.values():
+            if peer in queue:
+                queue.remove(peer)
+        if peer.match is not None:
+            peer.match.leave(peer)
+
+    async def tick_loop(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        interval = SnakeGame.step_interval
+        due = loop.time()
+        while True:
+            due += interval
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            now = loop.time()
+            if now - due > interval / 2:
+                self.late += 1
+                if now - due > 1.0:
+                    due = now  # hopelessly behind: drop the backlog rather than burst
+            self.snake_matches = [m for m in self.snake_matches if not m.closed]
+            for match in self.snake_matches:
+                match.step(now)
+            self.tick_work.append(loop.time() - now)
+
+    def stats(self):
+        work = sorted(self.tick_work) or [0.0]
+        return {"peers": self.peers, "matches": self.matches, "snake_matches": len(self.snake_matches),
+                "late_ticks": self.late, "tick_work_ms_p50": round(work[len(work) // 2] * 1000, 3),
+                "tick_work_ms_max": round(work[-1] * 1000, 3)}
+
+    async def serve(self, host, port):
+        import asyncio
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        ticker = asyncio.ensure_future(self.tick_loop())
+        print(f"arcade server on {host}:{server.sockets[0].getsockname()[1]}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            ticker.cancel()
+
+def serve_main(argv=None):
+    import argparse
+    import asyncio
+    ap = argparse.ArgumentParser(prog="gamelibs.py serve", description="Run the netplay match server.")
+    ap.add_argument("--host", default=NET_ADDR[0], help="interface to listen on (default: %(default)s)")
+    ap.add_argument("--port", type=int, default=NET_ADDR[1], help="default: %(default)s; 0 picks a free port")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(ArcadeServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+class NetClient:
+    """A game's connection to the server, run by an asyncio loop on its own thread.
+    The frame loop only calls send() and poll(), and neither ever waits on the network."""
+    ping_every = 1.0
+
+    def __init__(self, game, addr=None):
+        import asyncio
+        import queue
+        import threading
+        self.inbox = queue.SimpleQueue()
+        self.rtt = None  # smoothed round trip, seconds
+        self.writer = None
+        self.closed = False
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.thread, args=(game, addr or net_addr()), daemon=True).start()
+
+    def thread(self, game, addr):
+        try:
+            self.loop.run_until_complete(self.run(game, addr))
+        finally:
+            self.loop.close()
+
+    async def run(self, game, addr):
+        import asyncio
+        try:
+            reader, self.writer = await asyncio.wait_for(asyncio.open_connection(*addr), 3.0)
+        except (OSError, asyncio.TimeoutError):
+            self.inbox.put({"t": "error"})
+            return
+        if self.closed:
+            self.writer.close()
+            return
+        self.writer.write(net_encode({"t": "hello", "game": game}))
+        pinger = asyncio.ensure_future(self.ping())
+        try:
+            async for line in reader:
+                msg = json.loads(line)
+                if msg.get("t") == "pong":
+                    rtt = time.perf_counter() - msg["ts"]
+                    self.rtt = rtt if self.rtt is None else self.rtt + (rtt - self.rtt) * 0.2
+                else:
+                    self.inbox.put(msg)
+        except (OSError, ValueError):
+            pass
+        finally:
+            pinger.cancel()
+            self.writer.close()
+            self.inbox.put({"t": "closed"})
+
+    async def ping(self):
+        import asyncio
+        while True:
+            self.write(net_encode({"t": "ping", "ts": time.perf_counter()}))
+            await asyncio.sleep(self.ping_every)
+
+    def write(self, data):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(data)
+
+    def call(self, fn, *args):
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass  # the loop has finished: the connection is already gone
+
+    def send(self, msg):
+        self.call(self.write, net_encode(msg))
+
+    def poll(self):
+        msgs = []
+        while not self.inbox.empty():
+            msgs.append(self.inbox.get())
+        return msgs
+
+    def close(self):
+        self.closed = True
+        self.call(lambda: self.writer and self.writer.close())
 
-    while True:
-        dt = clock.tick(60) / 1000.0
-        t += dt
+    def rtt_text(self):
+        return f"{self.rtt * 1000:.0f} ms" if self.rtt is not None else "-- ms"
 
-        events = pygame.event.get()
+NET_NOTES = {"wait": "Waiting for an opponent...", "left": "Opponent left", "closed": "Disconnected",
+             "error": "Can't reach the server"}
+
+class NetScene(Scene):
+    """Base for online matches: connects on enter/resume, hangs up when left, and shows
+    the lobby until the server starts a match."""
+    game = None
+    client = None
+
+    def enter(self):
+        self.connect()
+
+    def resume(self):
+        self.connect()
+
+    def suspend(self):
+        self.hangup()
+
+    def exit(self):
+        self.hangup()
+
+    def connect(self):
+        self.client = NetClient(self.game)
+        self.note = "Connecting..."
+        self.started = False
+
+    def hangup(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def update(self, dt, events):
         for e in events:
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            if e.type == pygame.KEYDOWN and e.key == pygame.K_F11:
-                toggle_fullscreen()
-
-        if state == "menu":
-            for e in events:
-                if e.type == pygame.KEYDOWN:
-                    if e.key == pygame.K_a:
-                        run_atari()
-                    elif e.key == pygame.K_s:
-                        run_snake()
-                    elif e.key == pygame.K_t:
-                        run_tictactoe()
-                    elif e.key == pygame.K_q:
-                        pygame.quit(); sys.exit()
-
-            starfield.update(dt, 0.7)
-            draw_menu(starfield, t)
-            pygame.display.flip()
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_m:
+                self.director.switch("menu")
+                return
+        for msg in self.client.poll():
+            if msg["t"] == "start":
+                self.started = True
+                self.start(msg)
+            elif msg["t"] in NET_NOTES:
+                self.note = NET_NOTES[msg["t"]]
+                if msg["t"] != "wait":
+                    self.started = False
+                if msg["t"] == "left":
+                    self.client.send({"t": "hello", "game": self.game})  # queue for the next opponent
+            else:
+                self.receive(msg)
+        self.handle(events)
+
+    def draw_lobby(self):
+        w, h = screen.get_size()
+        screen.fill(BLACK)
+        draw_text(screen, self.note, font_big, UI, center=(w // 2, h // 2 - 20))
+        host, port = net_addr()
+        draw_text(screen, f"Server {host}:{port}  •  M: Menu", font_small, UI, center=(w // 2, h // 2 + 30))
+
+class NetTicTacToe(TicTacToe):
+    """Board for an online match: the remote player sits in the `ai` seat, so clicks are
+    only taken on our turn, and our moves go to the server."""
+    hint = "Online  •  R: Rematch  •  M: Menu"
+
+    def __init__(self, me, client):
+        self.me, self.client = me, client
+        super().__init__(ai="O" if me == "X" else "X")
+
+    def ai_move(self):
+        pass  # the other seat moves over the network
+
+    def handle_mouse(self, pos, size):
+        moves = self.moves
+        super().handle_mouse(pos, size)
+        if self.moves != moves:
+            r, c = self.dirty[-1]
+            self.client.send({"t": "move", "cell": r * self.cols + c})
+
+    def status(self):
+        if self.winner == "Draw":
+            return "Draw!"
+        if self.winner:
+            return "You win!" if self.winner == self.me else "You lose"
+        return ("Your turn" if self.turn == self.me else "Their turn") + f" ({self.me})  {self.client.rtt_text()}"
+
+class NetTicTacToeScene(NetScene):
+    game = "tictactoe"
+    board = None
+
+    def invalidate(self):
+        if self.board:
+            self.board.redraw = True
+
+    def start(self, msg):
+        self.board = NetTicTacToe(msg["you"], self.client)
+
+    def receive(self, msg):
+        if msg["t"] == "move":
+            self.board.play(msg["cell"] // 3, msg["cell"] % 3)
+
+    def handle(self, events):
+        if not self.started:
+            return
+        for e in events:
+            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+                self.board.handle_mouse(e.pos, screen.get_size())
+            elif e.type == pygame.KEYDOWN and e.key == pygame.K_r and self.board.winner:
+                self.client.send({"t": "again"})
+
+    def draw(self):
+        if not self.started:
+            self.draw_lobby()
+            return None
+        return self.board.present()
+
+class NetSnakeScene(NetScene):
+    """Online Snake. The board mirrors the server's deltas; our own head is predicted
+    locally, sliding toward the next cell in the direction just pressed, so turns show
+    at once instead of a round trip later. Redrawn in full every frame."""
+    game = "snake"
+    colors = ((GREEN, (0, 160, 0)), (BLUE, (50, 90, 190)))
+
+    def start(self, msg):
+        self.cols, self.rows, self.me = msg["cols"], msg["rows"], msg["you"]
+        self.interval = msg["interval"]
+        self.snakes = [deque(tuple(c) for c in s) for s in msg["snakes"]]
+        self.dirs = [DIRS[d] for d in msg["dirs"]]
+        self.want = self.dirs[self.me]
+        self.food = tuple(msg["food"])
+        self.result = None
+        self.tick_at = time.perf_counter()
+
+    def receive(self, msg):
+        if msg["t"] == "tick":
+            for i, move in enumerate(msg["m"]):
+                if move:
+                    x, y, popped = move
+                    hx, hy = self.snakes[i][0]
+                    self.dirs[i] = (x - hx, y - hy)
+                    self.snakes[i].appendleft((x, y))
+                    if popped:
+                        self.snakes[i].pop()
+            for i in msg.get("d", ()):
+                self.snakes[i].clear()
+            if "f" in msg:
+                self.food = msg["f"] and tuple(msg["f"])
+            self.tick_at = time.perf_counter()
+        elif msg["t"] == "over":
+            w = msg["winner"]
+            self.result = "Draw" if w is None else ("You win!" if w == self.me else "You lose")
+
+    def handle(self, events):
+        if not self.started:
+            return
+        keys = {pygame.K_RIGHT: 0, pygame.K_LEFT: 1, pygame.K_DOWN: 2, pygame.K_UP: 3}
+        d = self.dirs[self.me]
+        for e in events:
+            if e.type == pygame.KEYDOWN and e.key in keys and DIRS[keys[e.key]] != (-d[0], -d[1]):
+                self.want = DIRS[keys[e.key]]
+                self.client.send({"t": "dir", "d": keys[e.key]})
+
+    def geometry(self):
+        w, h = screen.get_size()
+        cell = max(2, min(w // self.cols, (h - HUD_H) // self.rows))
+        return cell, (w - cell * self.cols) // 2, HUD_H + (h - HUD_H - cell * self.rows) // 2
+
+    def draw(self):
+        if not self.started:
+            self.draw_lobby()
+            return None
+        w, h = screen.get_size()
+        cell, ox, oy = self.geometry()
+        screen.fill(BLACK)
+        pygame.draw.rect(screen, DEEP, (0, 0, w, HUD_H))
+        pygame.draw.rect(screen, (14, 16, 22), (ox, oy, cell * self.cols, cell * self.rows))
+        lens = [len(s) for s in self.snakes]
+        draw_text(screen, f"You: {'green' if self.me == 0 else 'blue'}  •  {lens[self.me]} vs {lens[1 - self.me]}  •  RTT {self.client.rtt_text()}",
+                  font_med, UI, topleft=(16, 16))
+        draw_text(screen, "Arrows: Move  •  M: Menu", font_small, UI, topleft=(w - 260, 20))
+        if self.food:
+            pygame.draw.rect(screen, RED, (ox + self.food[0] * cell, oy + self.food[1] * cell, cell, cell))
+        for i, snake in enumerate(self.snakes):
+            head, body = self.colors[i % 2]
+            for j, (x, y) in enumerate(snake):
+                pygame.draw.rect(screen, head if j == 0 else body, (ox + x * cell + 1, oy + y * cell + 1, cell - 2, cell - 2), border_radius=cell // 4)
+        mine = self.snakes[self.me]
+        if mine and self.result is None:
+            a = clamp((time.perf_counter() - self.tick_at) / self.interval, 0.0, 1.0)
+            x, y = mine[0]
+            px, py = ox + (x + self.want[0] * a) * cell, oy + (y + self.want[1] * a) * cell
+            pygame.draw.rect(screen, self.colors[self.me % 2][0], (int(px) + 1, int(py) + 1, cell - 2, cell - 2), width=2, border_radius=cell // 4)
+        if self.result:
+            draw_text(screen, self.result, font_title, UI, center=(w // 2, h // 2))
+        return None
+
+# Load test: hundreds of scripted clients in one process against one server process
+async def net_bot(game, addr, seconds, delay, rng, stats):
+    """One simulated player making random legal moves; records what it measured into stats."""
+    import asyncio
+    await asyncio.sleep(delay)  # stagger the connection burst
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*addr), 10.0)
+    except (OSError, asyncio.TimeoutError):
+        stats["failed"] += 1
+        return
+    loop = asyncio.get_running_loop()
+    writer.write(net_encode({"t": "hello", "game": game}))
+    end, pinged, last_tick = loop.time() + seconds - delay, 0.0, None
+    rules, bits, me = mnk_rules(3, 3, 3), [0, 0], 0
+
+    def ttt_move():
+        free = [c for c in range(9) if not (bits[0] | bits[1]) >> c & 1]
+        cell = rng.choice(free)
+        bits[me] |= 1 << cell
+        writer.write(net_encode({"t": "move", "cell": cell}))
+        stats["moves"] += 1
+        return ttt_over(cell, me)
+
+    def ttt_over(cell, side):
+        if rules.wins_at(bits[side], cell) or bits[0] | bits[1] == FULL_BOARD:
+            writer.write(net_encode({"t": "again"}))
+            stats["rounds"] += 1
+            return True
+        return False
+
+    try:
+        while loop.time() < end:
+            now = loop.time()
+            if now - pinged >= 0.5:
+                writer.write(net_encode({"t": "ping", "ts": time.perf_counter()}))
+                pinged = now
+            try:
+                line = await asyncio.wait_for(reader.readline(), min(0.5, max(0.001, end - now)))
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            stats["bytes"] += len(line)
+            msg = json.loads(line)
+            t, now = msg["t"], loop.time()
+            if t == "pong":
+                stats["rtt"].append(time.perf_counter() - msg["ts"])
+            elif t == "start":
+                stats["starts"] += 1
+                last_tick = None
+                if game == "tictactoe":
+                    bits, me = [0, 0], "XO".index(msg["you"])
+                    if me == 0:
+                        ttt_move()
+            elif t == "move":
+                bits[1 - me] |= 1 << msg["cell"]
+                if not ttt_over(msg["cell"], 1 - me):
+                    ttt_move()
+            elif t == "tick":
+                stats["ticks"] += 1
+                if last_tick is not None:
+                    stats["gaps"].append(now - last_tick)
+                last_tick = now
+                if rng.random() < 0.15:
+                    writer.write(net_encode({"t": "dir", "d": rng.randrange(4)}))
+            elif t == "over":
+                stats["rounds"] += 1
+                last_tick = None
+            elif t == "left":
+                writer.write(net_encode({"t": "hello", "game": game}))  # back in the queue
+    except (OSError, ValueError):
+        stats["dropped"] += 1
+    finally:
+        writer.close()
+
+async def net_server_stats(addr):
+    import asyncio
+    reader, writer = await asyncio.open_connection(*addr)
+    writer.write(net_encode({"t": "stats"}))
+    line = await asyncio.wait_for(reader.readline(), 5.0)
+    writer.close()
+    return json.loads(line)
+
+async def run_loadtest(game, clients, seconds, addr, seed=0):
+    import asyncio
+    stats = {"failed": 0, "dropped": 0, "starts": 0, "rounds": 0, "moves": 0, "ticks": 0, "bytes": 0, "gaps": [], "rtt": []}
+    rng = random.Random(seed)
+    spread = min(2.0, clients * 0.002)
+    await asyncio.gather(*(net_bot(game, addr, seconds, spread * i / clients, random.Random(rng.getrandbits(64)), stats)
+                           for i in range(clients)))
+    try:
+        server = await net_server_stats(addr)
+        server.pop("t")
+    except (OSError, ValueError, asyncio.TimeoutError):
+        server = None
+    return stats, server
+
+def loadtest_main(argv=None):
+    import argparse
+    import asyncio
+    import subprocess
+    ap = argparse.ArgumentParser(prog="gamelibs.py loadtest", description="Drive many simulated netplay clients against one server.")
+    ap.add_argument("--game", choices=("snake", "tictactoe"), default="snake")
+    ap.add_argument("--clients", type=int, default=200)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--server", metavar="HOST:PORT", help="server to test (default: start a local one)")
+    ap.add_argument("--json", metavar="PATH", help="also write the report here")
+    args = ap.parse_args(argv)
+
+    proc = None
+    if args.server:
+        addr = net_addr(args.server)
+    else:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", "0"],
+                                stdout=subprocess.PIPE, text=True)
+        for line in proc.stdout:  # skip pygame's banner up to the "listening" line
+            if line.startswith("arcade server on"):
+                addr = (NET_ADDR[0], int(line.rsplit(":", 1)[1]))
+                break
         else:
-            state = "menu"
+            sys.exit("loadtest: the server did not start")
+    try:
+        t0 = time.perf_counter()
+        stats, server = asyncio.run(run_loadtest(args.game, args.clients, args.seconds, addr))
+        secs = time.perf_counter() - t0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    def pct(xs, p):
+        xs = sorted(xs)
+        return round(xs[min(len(xs) - 1, int(len(xs) * p))] * 1000, 2) if xs else None
+    interval = SnakeGame.step_interval
+    report = {
+        "game": args.game, "clients": args.clients, "seconds": round(secs, 2),
+        "connect_failed": stats["failed"], "dropped": stats["dropped"],
+        "rounds_started": stats["starts"] // 2, "rounds_finished": stats["rounds"] // 2,
+        "rtt_ms_p50": pct(stats["rtt"], 0.5), "rtt_ms_p99": pct(stats["rtt"], 0.99),
+        "server": server,
+    }
+    if args.game == "snake":
+        gaps = stats["gaps"]
+        report.update({
+            "ticks_per_s": round(stats["ticks"] / secs), "bytes_per_tick": round(stats["bytes"] / max(1, stats["ticks"]), 1),
+            "tick_gap_ms_p50": pct(gaps, 0.5), "tick_gap_ms_p99": pct(gaps, 0.99),
+            # Share of ticks that arrived within 1.5 intervals of the previous one
+            "on_time": round(sum(g <= interval * 1.5 for g in gaps) / len(gaps), 4) if gaps else None,
+        })
+    else:
+        report["moves_per_s"] = round(stats["moves"] / secs)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+# ------------- Main -------------
+def main(start="menu"):
+    init_display()
+    scenes = {"menu": MenuScene(), "atari": AtariScene(), "snake": SnakeScene(), "tictactoe": TicTacToeScene(),
+              "net-snake": NetSnakeScene(), "net-tictactoe": NetTicTacToeScene(), "demo": DemoScene()}
+    Director(scenes, start).run()
+
+def play_main(argv=None):
+    import argparse
+    global render_scale, logical_size
+    ap = argparse.ArgumentParser(prog="gamelibs.py", description="Play the arcade (batch, replay, serve and loadtest are subcommands).")
+    ap.add_argument("--profile", metavar="FILE", help="stream per-frame phase timings: CSV, or a Chrome trace for *.json")
+    ap.add_argument("--render-scale", type=float, default=render_scale, metavar="S",
+                    help="in fullscreen, render at S times the display resolution and scale up, e.g. 0.5 on 4k (default: %(default)s)")
+    ap.add_argument("--logical", metavar="WxH", help="in fullscreen, render at this fixed resolution and scale it to the display")
+    ap.add_argument("--stars", type=int, default=MenuScene.stars, metavar="N",
+                    help="menu starfield size; 0 gives a still menu that sleeps between inputs (default: %(default)s)")
+    ap.add_argument("--record", metavar="FILE", help="capture frames to FILE: .raw, or gzipped .raw.gz (a .json sidecar says how to encode it)")
+    ap.add_argument("--record-cmd", metavar="CMD",
+                    help="pipe raw frames to CMD, e.g. 'ffmpeg -y -f rawvideo -pix_fmt {pix_fmt} -s {w}x{h} -r {fps} -i - out{n}.mp4'")
+    ap.add_argument("--record-fps", type=int, default=FrameRecorder.fps, metavar="N", help="capture rate (default: %(default)s)")
+    ap.add_argument("--no-clip", action="store_true", help="do not keep the last 30s of frames for F9 clips")
+    ap.add_argument("--startup", action="store_true", help="print the time to first frame (JSON) and exit")
+    args = ap.parse_args(argv)
+    if not 0 < args.render_scale <= 1:
+        ap.error("--render-scale must be in (0, 1]")
+    render_scale = args.render_scale
+    MenuScene.stars = max(0, args.stars)
+    if args.logical:
+        try:
+            logical_size = tuple(int(v) for v in args.logical.lower().split("x"))
+        except ValueError:
+            logical_size = ()
+        if len(logical_size) != 2 or min(logical_size) < 1:
+            ap.error("--logical must look like 1920x1080")
+    if args.profile:
+        profiler.export(args.profile)
+    if args.record_fps < 1:
+        ap.error("--record-fps must be at least 1")
+    recorder.fps = args.record_fps
+    if args.record or args.record_cmd or not args.no_clip:
+        recorder.start(clip=not args.no_clip, path=args.record, command=args.record_cmd)
+    if args.startup:
+        imported = time.perf_counter()
+        cached = os.path.exists(cache_path(FONT_CACHE_FILE))
+
+        def report(director):
+            shown = time.perf_counter()
+            print(json.dumps({"import_s": round(imported - STARTED, 4), "first_frame_s": round(shown - imported, 4),
+                              "total_s": round(shown - STARTED, 4), "font_cache": cached}))
+            director.quit()
+        Director.first_frame = report
+    main()
 
 if __name__ == "__main__":
-    main()  
+    if sys.argv[1:2] == ["batch"]:
+        batch_main(sys.argv[2:])
+    elif sys.argv[1:2] == ["replay"]:
+        replay_main(sys.argv[2:])
+    elif sys.argv[1:2] == ["serve"]:
+        serve_main(sys.argv[2:])
+    elif sys.argv[1:2] == ["loadtest"]:
+        loadtest_main(sys.argv[2:])
+    else:
+        play_main(sys.argv[1:])
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Headless pygame and a throwaway arcade cache; set before gamelibs is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def arcade_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARCADE_CACHE", str(tmp_path / "cache"))
+    return tmp_path / "cache"
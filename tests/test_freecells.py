@@ -0,0 +1,47 @@
+import random
+
+from gamelibs import FreeCells
+
+
+def test_take_release_track_membership():
+    free = FreeCells(4, 3)
+    assert len(free) == 12
+    free.take(free.id(1, 2))
+    free.take(free.id(1, 2))  # taking an occupied cell is a no-op
+    assert len(free) == 11
+    assert not free.is_free(free.id(1, 2))
+    free.release(free.id(1, 2))
+    free.release(free.id(1, 2))  # so is releasing a free one
+    assert len(free) == 12
+    assert free.is_free(free.id(1, 2))
+
+
+def test_random_ops_match_a_set():
+    rng = random.Random(7)
+    free = FreeCells(5, 4)
+    ref = set(range(20))
+    for _ in range(2000):
+        c = rng.randrange(20)
+        if rng.random() < 0.5:
+            free.take(c)
+            ref.discard(c)
+        else:
+            free.release(c)
+            ref.add(c)
+        assert sorted(free.cells) == sorted(ref)
+        assert all(free.cells[free.slot[c]] == c for c in ref)
+        assert all(free.slot[c] == -1 for c in set(range(20)) - ref)
+
+
+def test_choice_only_returns_free_cells():
+    rng = random.Random(3)
+    free = FreeCells(6, 5)
+    for c in range(30):
+        if c % 3:
+            free.take(c)
+    seen = set()
+    for _ in range(500):
+        x, y = free.choice(rng)
+        assert free.is_free(free.id(x, y))
+        seen.add((x, y))
+    assert seen == {(c % 6, c // 6) for c in range(0, 30, 3)}
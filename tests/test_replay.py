@@ -0,0 +1,133 @@
+import random
+
+import pygame
+import pytest
+
+import gamelibs as g
+
+
+def atari_state(sim):
+    n = sim.enemies.n
+    return (sim.score, sim.player.x, sim.player.lives, sim.enemies.x[:n].tolist(),
+            sim.bullets.n, round(sim.t, 9))
+
+
+def snake_state(game):
+    return game.score, list(game.snake), game.food, game.alive
+
+
+def replay(path):
+    log = g.ReplayLog(path)
+    sim = log.new_sim()
+    for bits, size in log:
+        g.replay_tick(sim, bits, size)
+    log.close()
+    return sim
+
+
+def test_atari_session_replays(tmp_path):
+    path = str(tmp_path / "atari.arcr")
+    rng = random.Random(1)
+    sim = g.AtariSim(800, 600, seed=12345)
+    log = g.InputLog(path, "atari", sim.seed, (800, 600))
+    move, fire = 0, False
+    for t in range(3000):
+        if t % 40 == 0:
+            move, fire = rng.choice((-1, 0, 1)), rng.random() < 0.7
+        if t == 1000:
+            sim.resize(1024, 768)
+            log.resize(1024, 768)
+        if t == 2000:
+            sim.reset()
+            log.restart()
+        log.tick(g.atari_bits(move, fire))
+        sim.step(sim.dt, move, fire)
+    log.close()
+
+    assert sim.score > 0
+    assert atari_state(replay(path)) == atari_state(sim)
+    stats = g.replay_turbo(path)
+    assert (stats["game"], stats["seed"], stats["ticks"], stats["score"]) == ("atari", 12345, 3000, sim.score)
+
+
+def test_snake_session_replays(tmp_path):
+    path = str(tmp_path / "snake.arcr")
+    rng = random.Random(2)
+    game = g.SnakeGame(600, 460, seed=777)
+    log = g.InputLog(path, "snake", game.seed, (600, 460))
+    pilot = g.SnakePilot()
+    for t in range(600):
+        if not game.alive:
+            game.reset()
+            log.restart()
+        if t == 300:
+            game.resize(500, 410)
+            log.resize(500, 410)
+        game.turn(pilot.choose(game) if rng.random() < 0.9 else rng.choice(g.DIRS))
+        presses = rng.random() < 0.05
+        game.grow += presses
+        log.tick(g.snake_bits(game, presses))
+        game.step()
+    log.close()
+
+    assert snake_state(replay(path)) == snake_state(game)
+    stats = g.replay_turbo(path)
+    assert (stats["game"], stats["ticks"], stats["score"]) == ("snake", 600, game.score)
+
+
+@pytest.fixture
+def display():
+    g.init_display()  # once per run: later calls see the screen and return early
+
+
+@pytest.mark.parametrize("cls, attr", [(g.SnakeScene, "game"), (g.AtariScene, "sim")])
+def test_resize_between_preload_and_enter(display, monkeypatch, arcade_cache, cls, attr):
+    # F11 on the menu: the scene was preloaded at one size and entered at another
+    monkeypatch.setattr(g, "screen", pygame.Surface((1000, 700)))
+    scene = cls()
+    scene.preload()
+    monkeypatch.setattr(g, "screen", pygame.Surface((1024, 768)))
+    scene.resize()
+    scene.enter()
+    if cls is g.SnakeScene:
+        scene.pilot = g.SnakePilot()
+    for _ in range(200):
+        scene.update(0.05, [])
+    scene.exit()
+
+    sim = getattr(scene, attr)
+    path, = (arcade_cache / "replays").iterdir()
+    log = g.ReplayLog(str(path))
+    assert log.size == (1000, 700)
+    log.close()
+    replayed = replay(str(path))
+    state = snake_state if cls is g.SnakeScene else atari_state
+    assert (replayed.w, replayed.h) == (sim.w, sim.h)
+    assert state(replayed) == state(sim)
+
+
+@pytest.mark.parametrize("data", [b"", b"ARC", b"XXXX" + bytes(13)])
+def test_bad_logs_are_refused(tmp_path, data):
+    path = tmp_path / "bad.arcr"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match="not an arcade replay log"):
+        g.ReplayLog(str(path))
+
+
+def test_log_is_on_disk_before_close(tmp_path, monkeypatch):
+    path = str(tmp_path / "live.arcr")
+    monkeypatch.setattr(g.InputLog, "flush_every", 0.0)
+    log = g.InputLog(path, "snake", 5, (600, 460))
+    for _ in range(10):
+        log.tick(0)
+    log.resize(500, 410)
+    log.tick(1)
+    # Read while the session is still open, as after a hard kill
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) == g.InputLog.HEADER.size + 11 + g.InputLog.RESIZE.size
+    (tmp_path / "cut.arcr").write_bytes(data[:-1])  # cut off inside the resize
+    replayed = g.ReplayLog(str(tmp_path / "cut.arcr"))
+    assert len(list(replayed)) == 10
+    replayed.close()
+    log.close()
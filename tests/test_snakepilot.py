@@ -0,0 +1,28 @@
+import pytest
+
+import gamelibs as g
+
+
+@pytest.mark.parametrize("w, h, seed", [(400, 310, 1), (500, 410, 0)])
+def test_pilot_keeps_reaching_food(w, h, seed):
+    # On these boards plain BFS moves once circled forever without eating
+    game = g.SnakeGame(w, h, seed=seed)
+    pilot = g.SnakePilot(budget=None)
+    cols, rows = game.grid_size()
+    score, idle = game.score, 0
+    while game.alive:
+        game.turn(pilot.choose(game))
+        game.step()
+        idle = 0 if game.score != score else idle + 1
+        score = game.score
+        assert idle <= 2 * cols * rows
+    assert game.score >= 500
+
+
+def test_stall_resets_with_the_game():
+    game = g.SnakeGame(400, 310, seed=1)
+    pilot = g.SnakePilot(budget=None)
+    pilot.idle = 10 ** 6
+    assert pilot.stalled(game)
+    pilot.choose(game)
+    assert not pilot.stalled(game)  # a game the pilot hasn't seen starts a fresh count
@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+import gamelibs as g
+
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+
+
+def won(bits):
+    return any(all(bits >> c & 1 for c in line) for line in LINES)
+
+
+@lru_cache(maxsize=None)
+def outcome(x, o):
+    """+1 / 0 / -1 for the side to move under perfect play (speed ignored)."""
+    x_turn = bin(x | o).count("1") % 2 == 0
+    if won(o if x_turn else x):
+        return -1
+    free = [c for c in range(9) if not (x | o) >> c & 1]
+    if not free:
+        return 0
+    return max(-outcome(x | 1 << c, o) if x_turn else -outcome(x, o | 1 << c) for c in free)
+
+
+def reachable():
+    seen, todo = set(), [(0, 0)]
+    while todo:
+        x, o = todo.pop()
+        if (x, o) in seen:
+            continue
+        seen.add((x, o))
+        x_turn = bin(x | o).count("1") % 2 == 0
+        if won(x) or won(o) or x | o == 0o777:
+            continue
+        for c in range(9):
+            if not (x | o) >> c & 1:
+                todo.append((x | 1 << c, o) if x_turn else (x, o | 1 << c))
+    return seen
+
+
+def test_table_move_is_optimal_everywhere():
+    table = g.solve_tictactoe()
+    assert len(table) == 1 << 18
+    positions = reachable()
+    assert len(positions) == 5478
+    for x, o in positions:
+        cell = table[x << 9 | o]
+        if won(x) or won(o) or x | o == 0o777:
+            assert cell == 255
+            continue
+        assert cell < 9 and not (x | o) >> cell & 1
+        x_turn = bin(x | o).count("1") % 2 == 0
+        after = outcome(x | 1 << cell, o) if x_turn else outcome(x, o | 1 << cell)
+        assert -after == outcome(x, o), (bin(x), bin(o), cell)
+
+
+def test_empty_board_is_a_draw():
+    assert outcome(0, 0) == 0
+
+
+def test_table_is_cached_on_disk(arcade_cache, monkeypatch):
+    monkeypatch.setattr(g, "_ttt_table", None)
+    table = g.tictactoe_table()
+    assert (arcade_cache / g.TTT_TABLE_FILE).read_bytes() == table
+    monkeypatch.setattr(g, "_ttt_table", None)
+    monkeypatch.setattr(g, "solve_tictactoe", lambda: b"")
+    assert g.tictactoe_table() == table
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import gamelibs as g
+
+
+def cell(c, cols):
+    return None if c < 0 else (int(c) % cols, int(c) // cols)
+
+
+@pytest.mark.parametrize("cols, rows", [(3, 2), (8, 6), (11, 7)])
+def test_matches_snakegame(cols, rows):
+    # One SnakeGame per board, fed the same actions and the food VecSnake placed
+    n = 16
+    v = g.VecSnake(n, cols, rows, seed=3)
+
+    def mirror(b):
+        game = g.SnakeGame(cols * 25, rows * 25 + g.HUD_H, seed=0)  # 25px cells
+        assert game.grid_size() == (cols, rows)
+        game.spawn_food = lambda: None
+        game.food = cell(v.food[b], cols)
+        return game
+
+    games = [mirror(b) for b in range(n)]
+    rng = np.random.default_rng(1)
+    deaths = longest = 0
+    for _ in range(1500):
+        hx, hy = v.head % cols, v.head // cols
+        fx, fy = v.food % cols, v.food // cols
+        greedy = np.where(fx > hx, 0, np.where(fx < hx, 1, np.where(fy > hy, 2, 3)))
+        actions = np.where(rng.random(n) < 0.2, rng.integers(0, 4, n), greedy)
+        for b, game in enumerate(games):
+            game.turn(g.DIRS[actions[b]])
+            game.step()
+        obs, _, dones = v.step(actions)
+        for b, game in enumerate(games):
+            if dones[b]:
+                deaths += 1
+                assert not game.alive
+                assert v.final_score[b] == game.score
+                games[b] = mirror(b)
+                continue
+            body = np.flatnonzero(v.entered[b] > v.tick[b] - v.length[b])
+            assert game.alive
+            assert sorted(body.tolist()) == sorted(y * cols + x for x, y in game.snake)
+            assert cell(v.head[b], cols) == game.snake[0]
+            assert v.score[b] == game.score
+            grid = obs[b].ravel()
+            assert grid[v.head[b]] == 2
+            assert (grid == 1).sum() == body.size - 1
+            assert v.food[b] < 0 or grid[v.food[b]] == 3
+            longest = max(longest, len(game.snake))
+            game.food = cell(v.food[b], cols)
+    assert deaths and longest > 3